@@ -0,0 +1,160 @@
+"""
+在本地替身服务上验证接口模式（ApiClient）：服务端按示例接口描述文件回放录制的响应，
+检查请求头/请求体的构造与余额、年、月、日数据的解析结果，并统计多个户号的抓取耗时。
+
+fixtures/api_endpoints.sample.json 同时是编写 API_SPEC_FILE 的参考；替身服务只使用其中的
+path，base_url 会被替换为本地地址。
+
+用法（在仓库根目录）：python benchmarks/bench_api_client.py [户号数] [服务端延迟毫秒]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from api_client import ApiClient, load_spec  # noqa: E402
+from const import DAILY_WINDOW_DAYS  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SPEC_PATH = os.path.join(FIXTURES, "api_endpoints.sample.json")
+TOKEN = "bench-token"
+USER_ID = "3300000001"
+
+
+def load_response(name):
+    with open(os.path.join(FIXTURES, "api_responses", f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeBrowser:
+    """提供 ApiClient.from_driver 所需的 cookies、UA 与 localStorage 的最小浏览器替身。"""
+
+    def get_cookies(self):
+        return [{"name": "JSESSIONID", "value": "bench", "domain": "127.0.0.1", "path": "/"}]
+
+    def execute_script(self, script, *args):
+        if "navigator.userAgent" in script:
+            return "Mozilla/5.0 (bench)"
+        if "localStorage" in script and args == ("token",):
+            return TOKEN
+        return None
+
+
+class FakeSGCCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    delay = 0.0
+    routes = {}
+    received = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.delay)
+        name = self.routes.get(self.path)
+        if name is None:
+            status, payload = 404, {"code": 0, "message": "not found"}
+        elif self.headers.get("token") != TOKEN or "JSESSIONID=bench" not in self.headers.get("Cookie", ""):
+            status, payload = 401, {"code": 0, "message": "未登录"}
+        else:
+            status, payload = 200, load_response(name)
+            with FakeSGCCHandler.lock:
+                FakeSGCCHandler.received.append((name, body))
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(spec, delay):
+    FakeSGCCHandler.delay = delay
+    FakeSGCCHandler.routes = {endpoint["path"]: name for name, endpoint in spec["endpoints"].items()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSGCCHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fetch_user(client, user_id):
+    """与 DataFetcher._get_all_data_from_api 相同的四次调用。"""
+    return (
+        client.get_balance(user_id),
+        client.get_yearly_data(user_id),
+        client.get_month_usage(user_id),
+        client.get_daily_usage_data(user_id, days=DAILY_WINDOW_DAYS),
+    )
+
+
+def check(spec):
+    FakeSGCCHandler.received = []
+    client = ApiClient.from_driver(spec, FakeBrowser())
+    balance, yearly, monthly, daily = fetch_user(client, USER_ID)
+    client.session.close()
+
+    assert balance == 86.52, balance
+    assert yearly == ("2315", "1256.74"), yearly
+    month, usage, charge = monthly
+    assert month[0] == "2026-01" and month[-1] == "2026-09" and len(usage) == len(charge) == 9, monthly
+    assert len(daily) == 30 and daily[0]["date"] == "2026-10-15" and daily[-1]["date"] == "2026-09-16", daily[:1]
+    assert daily[0] == {"date": "2026-10-15", "total": 11.0, "valley": 5.0, "flat": 2.5, "peak": 3.0, "sharp": None}, daily[0]
+    assert all(r["valley"] is not None and r["total"] is not None for r in daily)
+    print(f"解析: 余额 {balance} 元，年用电 {yearly[0]} kWh，{len(month)} 个月，{len(daily)} 天日记录（最新 {daily[0]['date']}）")
+
+    bodies = dict(FakeSGCCHandler.received)
+    assert set(bodies) == {"balance", "yearly", "monthly", "daily"}, bodies
+    assert all(body["consNo"] == USER_ID for body in bodies.values())
+    start = datetime.strptime(bodies["daily"]["startTime"], "%Y-%m-%d")
+    end = datetime.strptime(bodies["daily"]["endTime"], "%Y-%m-%d")
+    assert (end - start).days + 1 == DAILY_WINDOW_DAYS, bodies["daily"]
+    print(f"请求: 令牌取自 localStorage，日数据区间 {bodies['daily']['startTime']} ~ {bodies['daily']['endTime']}（{DAILY_WINDOW_DAYS} 天）")
+
+    # 令牌失效时抛出 HTTP 错误，DataFetcher 据此回退到页面抓取
+    client = ApiClient(spec)
+    try:
+        client.get_balance(USER_ID)
+        raise AssertionError("未登录请求未抛出异常")
+    except requests.HTTPError as e:
+        print(f"未登录: {e.response.status_code}")
+    client.session.close()
+
+
+def bench(spec, user_count):
+    client = ApiClient.from_driver(spec, FakeBrowser())
+    start = time.perf_counter()
+    for index in range(user_count):
+        fetch_user(client, f"{3300000000 + index}")
+    elapsed = time.perf_counter() - start
+    client.session.close()
+    print(f"{user_count} 个户号 × 4 个接口: {elapsed:.2f} s，每户 {elapsed / user_count * 1000:.1f} ms")
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    spec = load_spec(SPEC_PATH)
+    assert spec is not None
+    server, base_url = start_server(spec, 0)
+    spec = {**spec, "base_url": base_url}
+    check(spec)
+    FakeSGCCHandler.delay = delay_ms / 1000
+    print(f"替身服务 {base_url}，服务端延迟 {delay_ms:.0f} ms")
+    bench(spec, user_count)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
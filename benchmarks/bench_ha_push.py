@@ -0,0 +1,125 @@
+"""
+对比逐个 requests.post 推送与 HAClient（长连接 + 超时 + 并发）推送 HA 实体的耗时。
+使用本地伪 HA 服务（每个请求固定延迟模拟 HA 处理时间），不需要真实的 Home Assistant。
+
+用法（在仓库根目录）：python benchmarks/bench_ha_push.py [户号数] [服务端延迟毫秒]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+os.environ.setdefault("HASS_URL", "http://127.0.0.1/")
+os.environ.setdefault("HASS_TOKEN", "token")
+
+from ha_client import HAClient  # noqa: E402
+from sensor_updator import SensorUpdator  # noqa: E402
+
+TOKEN = "bench-token"
+
+
+class FakeHAHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与正文一次写出并关闭 Nagle，避免长连接上出现 40 ms 的延迟确认
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    delay = 0.005
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        json.loads(body)
+        time.sleep(self.delay)
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            status, payload = 401, b'{"message": "unauthorized"}'
+        else:
+            status, payload = 200, body
+            with FakeHAHandler.lock:
+                FakeHAHandler.received += 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(delay):
+    FakeHAHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHAHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def make_user(index):
+    """一个户号的完整数据，对应 update_one_userid 推送的 16 个实体。"""
+    tou = {"date": "2026-10-16", "valley": 3.1, "flat": 4.2, "peak": 5.3, "sharp": 1.4, "total": 14.0}
+    return (f"{3300000000 + index}", 88.5, "2026-10-16", 14.0, 1234.5, 2345.6, 100.2, 180.3, tou, tou, tou)
+
+
+def legacy_send(base_url, states):
+    """改造前的 send_url：每个实体单独 requests.post，无连接复用、无超时。"""
+    headers = {"Content-Type": "application-json", "Authorization": "Bearer " + TOKEN}
+    for sensor_name, body in states:
+        requests.post(base_url.rstrip("/") + "/api/states/" + sensor_name, json=body, headers=headers)
+
+
+def collect_states(updator, user):
+    """借用 SensorUpdator 的批次收集出一个户号的 [(实体, 请求体)]，不实际推送。"""
+    updator._local.batch = []
+    updator._collect_userid(user[0], f"_{user[0][-4:]}", *user[1:])
+    states, updator._local.batch = updator._local.batch, None
+    return states
+
+
+def main():
+    user_count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    server, base_url = start_server(delay_ms / 1000)
+    users = [make_user(i) for i in range(user_count)]
+
+    collector = SensorUpdator(HAClient(base_url, TOKEN, workers=1))
+    all_states = [collect_states(collector, user) for user in users]
+    entity_count = sum(len(states) for states in all_states)
+    print(f"伪 HA 服务 {base_url}，户号 {user_count} 个，实体 {entity_count} 个，服务端延迟 {delay_ms:.0f} ms")
+
+    start = time.perf_counter()
+    for states in all_states:
+        legacy_send(base_url, states)
+    legacy_s = time.perf_counter() - start
+    print(f"原实现（逐个 requests.post）: {legacy_s:.2f} s")
+
+    for workers in (1, 4, 8):
+        client = HAClient(base_url, TOKEN, timeout=10, workers=workers)
+        updator = SensorUpdator(client)
+        FakeHAHandler.received = 0
+        start = time.perf_counter()
+        results = [updator.update_one_userid(*user) for user in users]
+        elapsed = time.perf_counter() - start
+        client.close()
+        ok = sum(1 for user_results in results for result in user_results if result.ok)
+        assert ok == entity_count == FakeHAHandler.received, (ok, entity_count, FakeHAHandler.received)
+        print(f"HAClient workers={workers}: {elapsed:.2f} s，成功 {ok}/{entity_count}，加速 {legacy_s / elapsed:.1f}x")
+
+    # 鉴权失败时每个实体都返回失败结果，而不是只写一条日志
+    client = HAClient(base_url, "wrong-token", workers=4)
+    results = SensorUpdator(client).update_one_userid(*users[0])
+    client.close()
+    assert results and all(not result.ok and result.status == 401 for result in results)
+    print(f"错误令牌: {len(results)} 个实体均返回 401 失败结果")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+在本地 WebSocket 替身服务上验证 HAWebSocket（认证、流水线、断线重连、退回 REST），
+并对比 1000 个实体的存在性检查：逐个 REST GET 与一次 WebSocket get_states。
+
+用法（在仓库根目录）：python benchmarks/bench_ha_websocket.py [实体数]
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import AcceptConnection, CloseConnection, Request, TextMessage
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import bench_ha_push  # noqa: E402
+from bench_ha_push import FakeHAHandler, TOKEN  # noqa: E402
+from ha_statistics import StatisticsImporter, statistic_id  # noqa: E402
+from ha_websocket import HAWebSocket, HAWebSocketClient, HAWebSocketError, websocket_url  # noqa: E402
+
+
+class FakeHAWebSocket:
+    """
+    最小的 HA WebSocket 替身：auth_required → auth → auth_ok，支持 ping、get_states、
+    recorder/import_statistics 与 recorder/statistics_during_period（只返回区间内最后一行），
+    收到的命令记录在 received 中。drop_after 条命令后主动断开一次连接。
+    """
+
+    def __init__(self, entity_ids=(), drop_after=None):
+        self.entity_ids = list(entity_ids)
+        self.drop_after = drop_after
+        self.received = []
+        self.statistics = {}
+        self.connections = 0
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def _serve(self):
+        while True:
+            conn, _ = self._sock.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        self.connections += 1
+        ws = WSConnection(ConnectionType.SERVER)
+        authed = False
+
+        def send(message):
+            conn.sendall(ws.send(TextMessage(data=json.dumps(message))))
+
+        buffer = ""
+        try:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                ws.receive_data(data)
+                for event in ws.events():
+                    if isinstance(event, Request):
+                        conn.sendall(ws.send(AcceptConnection()))
+                        send({"type": "auth_required", "ha_version": "fake"})
+                    elif isinstance(event, CloseConnection):
+                        conn.sendall(ws.send(event.response()))
+                        return
+                    elif isinstance(event, TextMessage):
+                        buffer += event.data
+                        if not event.message_finished:
+                            continue
+                        message, buffer = json.loads(buffer), ""
+                        if not authed:
+                            if message.get("access_token") == TOKEN:
+                                authed = True
+                                send({"type": "auth_ok", "ha_version": "fake"})
+                            else:
+                                send({"type": "auth_invalid", "message": "Invalid access token"})
+                                return
+                            continue
+                        if self.drop_after is not None and len(self.received) >= self.drop_after:
+                            self.drop_after = None
+                            return
+                        self.received.append(message)
+                        if message["type"] == "ping":
+                            send({"id": message["id"], "type": "pong"})
+                        elif message["type"] == "get_states":
+                            states = [{"entity_id": e, "state": "1"} for e in self.entity_ids]
+                            send({"id": message["id"], "type": "result", "success": True, "result": states})
+                        elif message["type"] == "recorder/import_statistics":
+                            rows = self.statistics.setdefault(message["metadata"]["statistic_id"], {})
+                            for row in message["stats"]:
+                                rows[datetime.fromisoformat(row["start"])] = row
+                            send({"id": message["id"], "type": "result", "success": True, "result": None})
+                        elif message["type"] == "recorder/statistics_during_period":
+                            end = datetime.fromisoformat(message["end_time"])
+                            result = {}
+                            for statistic_id in message["statistic_ids"]:
+                                rows = [r for start, r in sorted(self.statistics.get(statistic_id, {}).items()) if start < end]
+                                if rows:
+                                    result[statistic_id] = [{"sum": rows[-1]["sum"]}]
+                            send({"id": message["id"], "type": "result", "success": True, "result": result})
+                        else:
+                            send({"id": message["id"], "type": "result", "success": False,
+                                  "error": {"code": "unknown_command", "message": "Unknown command."}})
+        finally:
+            conn.close()
+
+
+def check():
+    server = FakeHAWebSocket(drop_after=5)
+    ws = HAWebSocket(websocket_url(server.base_url), TOKEN)
+    results = ws.call_many([{"type": "ping"} for _ in range(500)])
+    assert len(results) == 500 and all(r["success"] for r in results)
+    print(f"流水线: 500 条命令一次发送，全部按 id 收到结果（服务端中途断开一次，连接次数 {server.connections}）")
+    assert server.connections == 2
+
+    try:
+        HAWebSocket(websocket_url(server.base_url), "wrong").call({"type": "ping"})
+        raise AssertionError("认证失败未抛出异常")
+    except HAWebSocketError as e:
+        print(f"错误令牌: {e}")
+    ws.close()
+
+    # 长期统计：两次导入的窗口重叠时累计值保持连续
+    importer = StatisticsImporter(HAWebSocket(websocket_url(server.base_url), TOKEN))
+    days = [f"2026-09-{d:02d}" for d in range(1, 31)]
+    records = [{"date": d, "total": 10.0, "valley": 4.0, "flat": 3.0, "peak": 2.0, "sharp": 1.0} for d in days]
+    assert importer.import_records("3300000001", records[:20]) == 100
+    assert importer.import_records("3300000001", records[10:]) == 100
+    rows = server.statistics[statistic_id("total", "3300000001")]
+    sums = [row["sum"] for _, row in sorted(rows.items())]
+    assert sums == [10.0 * (i + 1) for i in range(30)], sums
+    print(f"长期统计: 重叠导入后 {len(sums)} 天累计值连续，最后 {sums[-1]} kWh")
+    importer.close()
+
+    # WebSocket 端口不可用时，存在性检查退回 REST GET
+    http_server, http_url = bench_ha_push.start_server(0)
+    client = HAWebSocketClient(http_url, TOKEN)
+    client.ws.url = "ws://127.0.0.1:9/api/websocket"
+    status = client.get_state_status("sensor.not_there")
+    assert status == 501 and not client.websocket_available, status
+    print(f"WebSocket 不可用: 退回 REST，状态码 {status}")
+    client.close()
+    http_server.shutdown()
+
+
+def bench(entity_count):
+    entity_ids = [f"sensor.bench_{i}" for i in range(entity_count)]
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    FakeHAHandler.do_GET = do_GET
+    http_server, http_url = bench_ha_push.start_server(0.002)
+    ws_server = FakeHAWebSocket(entity_ids)
+
+    client = HAWebSocketClient(http_url, TOKEN, workers=1)
+    start = time.perf_counter()
+    for entity_id in entity_ids:
+        assert super(HAWebSocketClient, client).get_state_status(entity_id) == 200
+    rest_s = time.perf_counter() - start
+
+    client.ws.url = websocket_url(ws_server.base_url)
+    start = time.perf_counter()
+    for entity_id in entity_ids:
+        assert client.get_state_status(entity_id) == 200
+    ws_s = time.perf_counter() - start
+    client.close()
+    http_server.shutdown()
+    print(f"{entity_count} 个实体存在性检查: REST GET {rest_s:.2f} s，WebSocket get_states {ws_s:.3f} s，"
+          f"加速 {rest_s / ws_s:.0f}x")
+
+
+def main():
+    entity_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    check()
+    bench(entity_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+校验 ONNX.get_distances 的批量结果与逐张 get_distance 完全一致，并对比两者的耗时。
+
+用法（在仓库根目录）：python benchmarks/bench_onnx_batch.py [图片数] [captcha.onnx]
+不传模型时使用按像素计算检测框的替身会话，只验证批量预处理、拆分与后处理；
+传入模型路径时在真实模型上校验并计时。
+"""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from onnx import ONNX, MODEL_INPUT_SIZE  # noqa: E402
+
+
+class StandInSession:
+    """
+    形状与滑块模型一致的替身：每张图输出 [候选框数, 6]（x, y, w, h, 置信度, 类别分数），
+    缺口框的 x 取第 0 通道最亮的列，另有一个重叠的低分框和若干低于阈值的噪声框。
+    batch 为 None 表示动态 batch，传入整数时模拟导出时固定了 batch 维度的模型。
+    """
+
+    def __init__(self, batch=None, delay=0.0):
+        self.batch = batch
+        self.delay = delay
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[self.batch, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE])]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name="output")]
+
+    def run(self, output_names, feed):
+        batch = feed["images"]
+        if self.batch is not None:
+            assert batch.shape[0] == self.batch, batch.shape
+        # 模拟推理的固定开销，批量时只付一次
+        time.sleep(self.delay)
+        columns = batch[:, 0].mean(axis=1).argmax(axis=1).astype(np.float32)
+        output = np.zeros((batch.shape[0], 64, 6), dtype=np.float32)
+        output[:, :, 4] = 0.1
+        output[:, 0] = np.stack([columns + 20, np.full_like(columns, 200), np.full_like(columns, 40),
+                                 np.full_like(columns, 40), np.full_like(columns, 0.95), np.ones_like(columns)], axis=1)
+        output[:, 1] = output[:, 0] + np.array([2, 2, 0, 0, -0.15, 0], dtype=np.float32)
+        return [output]
+
+
+def stand_in_onnx(session):
+    onnx = ONNX.__new__(ONNX)
+    onnx.onnx_session = session
+    onnx._input_name = "images"
+    onnx._output_name = "output"
+    onnx._input_buffer = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+    onnx._use_io_binding = False
+    onnx._lock = threading.Lock()
+    return onnx
+
+
+def make_images(count):
+    """带透明通道的滑块背景图，每张的缺口（亮块）位置不同。"""
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        pixels = rng.integers(0, 128, (160, 320, 4), dtype=np.uint8)
+        x = 40 + (i * 37) % 240
+        pixels[60:100, x:x + 30, :3] = 255
+        pixels[..., 3] = 255
+        images.append(Image.fromarray(pixels, "RGBA"))
+    return images
+
+
+def check(onnx, images, label):
+    expected = [onnx.get_distance(image) for image in images]
+    actual = onnx.get_distances(images)
+    assert actual == expected, (actual, expected)
+    assert onnx.get_distances([]) == []
+    print(f"{label}: {len(images)} 张图批量距离与逐张一致 {actual[:5]}...")
+
+
+def bench(onnx, images, label):
+    onnx.get_distances(images)  # 预热并按批量大小扩容缓冲区
+    start = time.perf_counter()
+    for image in images:
+        onnx.get_distance(image)
+    single_s = time.perf_counter() - start
+    start = time.perf_counter()
+    onnx.get_distances(images)
+    batch_s = time.perf_counter() - start
+    print(f"{label}: 逐张 {single_s * 1000:.1f} ms，批量 {batch_s * 1000:.1f} ms，加速 {single_s / batch_s:.1f}x")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    model = sys.argv[2] if len(sys.argv) > 2 else None
+    images = make_images(count)
+
+    check(stand_in_onnx(StandInSession()), images, "替身会话（动态 batch）")
+    check(stand_in_onnx(StandInSession(batch=1)), images, "替身会话（固定 batch=1）")
+    bench(stand_in_onnx(StandInSession(delay=0.02)), images, "替身会话（每次推理 20 ms）")
+
+    if model:
+        onnx = ONNX(model)
+        check(onnx, images, "真实模型")
+        bench(onnx, images, "真实模型")
+
+
+if __name__ == "__main__":
+    main()
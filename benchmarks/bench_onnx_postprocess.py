@@ -0,0 +1,98 @@
+"""
+对比 ONNX.get_boxes 向量化实现与原逐行实现的输出与耗时。
+
+用法（在仓库根目录）：python benchmarks/bench_onnx_postprocess.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from onnx import ONNX  # noqa: E402
+
+# 416x416 输入的 YOLOv5 输出：(52*52 + 26*26 + 13*13) * 3 = 10647 个候选框
+NUM_CANDIDATES = 10647
+
+
+def legacy_get_boxes(onnx, prediction, confidence_threshold=0.7, nms_threshold=0.6):
+    """向量化之前的 get_boxes 实现，作为输出一致性的参照。"""
+    feature_map = np.squeeze(prediction)
+    conf = feature_map[..., 4] > confidence_threshold
+    box = feature_map[conf == True]
+    cls_cinf = box[..., 5:]
+    cls = []
+    for i in range(len(cls_cinf)):
+        cls.append(int(np.argmax(cls_cinf[i])))
+    all_cls = list(set(cls))
+    output = []
+    for i in range(len(all_cls)):
+        curr_cls = all_cls[i]
+        curr_cls_box = []
+        for j in range(len(cls)):
+            if cls[j] == curr_cls:
+                box[j][5] = curr_cls
+                curr_cls_box.append(box[j][:6])
+        curr_cls_box = np.array(curr_cls_box)
+        curr_cls_box = onnx.xywh2xyxy(curr_cls_box)
+        curr_out_box = onnx.nms(curr_cls_box, nms_threshold)
+        for k in curr_out_box:
+            output.append(curr_cls_box[k])
+    return np.array(output)
+
+
+def make_prediction(seed, num_classes=1, num_hits=200):
+    """生成 [1, N, 5+num_classes] 的伪预测张量，少量高置信度框聚集在几个缺口附近。"""
+    rng = np.random.default_rng(seed)
+    pred = np.empty((1, NUM_CANDIDATES, 5 + num_classes), dtype=np.float32)
+    pred[0, :, 0:2] = rng.uniform(0, 416, (NUM_CANDIDATES, 2))
+    pred[0, :, 2:4] = rng.uniform(8, 80, (NUM_CANDIDATES, 2))
+    pred[0, :, 4] = rng.uniform(0, 0.5, NUM_CANDIDATES)
+    pred[0, :, 5:] = rng.uniform(0, 1, (NUM_CANDIDATES, num_classes))
+    hits = rng.choice(NUM_CANDIDATES, num_hits, replace=False)
+    centers = rng.uniform(40, 376, (4, 2))
+    pred[0, hits, 0:2] = centers[rng.integers(0, 4, num_hits)] + rng.normal(0, 3, (num_hits, 2))
+    pred[0, hits, 2:4] = rng.uniform(50, 60, (num_hits, 2))
+    pred[0, hits, 4] = rng.uniform(0.7, 1.0, num_hits)
+    return pred
+
+
+def check_equal(onnx):
+    cases = [(seed, num_classes, num_hits)
+             for seed in range(10)
+             for num_classes in (1, 3)
+             for num_hits in (0, 1, 50, 500)]
+    for seed, num_classes, num_hits in cases:
+        pred = make_prediction(seed, num_classes, num_hits)
+        expected = legacy_get_boxes(onnx, pred.copy())
+        actual = onnx.get_boxes(pred.copy())
+        assert expected.shape == actual.shape, (seed, num_classes, num_hits)
+        assert expected.dtype == actual.dtype, (seed, num_classes, num_hits)
+        assert np.array_equal(expected, actual), (seed, num_classes, num_hits)
+    print(f"输出一致性: {len(cases)} 组预测张量全部一致")
+
+
+def bench(func, pred, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(pred.copy())
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    # 后处理不依赖模型，跳过 __init__ 中的 InferenceSession 创建
+    onnx = ONNX.__new__(ONNX)
+    check_equal(onnx)
+    for num_hits in (50, 500, 2000):
+        pred = make_prediction(0, 1, num_hits)
+        legacy_ms = bench(lambda p: legacy_get_boxes(onnx, p), pred, 20)
+        new_ms = bench(onnx.get_boxes, pred, 20)
+        print(f"候选框 {NUM_CANDIDATES}，超过阈值 {num_hits}: "
+              f"原实现 {legacy_ms:.2f} ms，向量化 {new_ms:.2f} ms，加速 {legacy_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
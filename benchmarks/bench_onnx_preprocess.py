@@ -0,0 +1,100 @@
+"""
+对比 ONNX 预处理写入复用缓冲区前后的内存分配与单次耗时。
+
+用法（在仓库根目录）：python benchmarks/bench_onnx_preprocess.py [captcha.onnx]
+传入模型路径时额外对比完整推理（普通 run 与 IO binding）。
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from onnx import ONNX, MODEL_INPUT_SIZE  # noqa: E402
+
+
+def legacy_preprocess(image):
+    """改造之前 _inference 中的预处理。"""
+    org_img = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+    img = org_img.convert("RGB")
+    img = np.array(img).transpose(2, 0, 1)
+    img = img.astype(dtype=np.float32)
+    img /= 255.0
+    img = np.expand_dims(img, axis=0)
+    return img, org_img
+
+
+def legacy_inference(onnx, image):
+    img, org_img = legacy_preprocess(image)
+    inputs = {onnx.onnx_session.get_inputs()[0].name: img}
+    return onnx.onnx_session.run(None, inputs)[0], org_img
+
+
+def buffered_preprocess(onnx, image):
+    batch = onnx._get_input_buffer(1)
+    org_img = onnx._preprocess(image, batch[0])
+    return batch, org_img
+
+
+def measure(func, repeat):
+    """返回单次耗时（ms）与单次调用期间新分配的峰值内存（MiB）。"""
+    func()  # 预热，避免首次调用的一次性分配计入
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - base
+    tracemalloc.stop()
+    return elapsed, allocated / repeat / 1024 / 1024
+
+
+def report(name, elapsed, allocated):
+    print(f"{name}: {elapsed:.2f} ms/次，单次新分配峰值 {allocated:.2f} MiB")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    # 滑块背景图为带透明通道的 PNG，尺寸与线上一致
+    image = Image.fromarray(rng.integers(0, 256, (160, 320, 4), dtype=np.uint8), "RGBA")
+
+    model = sys.argv[1] if len(sys.argv) > 1 else None
+    if model:
+        onnx = ONNX(model)
+    else:
+        # 只测预处理，不需要推理会话
+        onnx = ONNX.__new__(ONNX)
+        onnx._input_buffer = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+
+    expected, _ = legacy_preprocess(image)
+    actual, _ = buffered_preprocess(onnx, image)
+    assert np.array_equal(expected, actual)
+    print("预处理结果与原实现一致")
+
+    repeat = 200
+    report("原预处理", *measure(lambda: legacy_preprocess(image), repeat))
+    report("缓冲区预处理", *measure(lambda: buffered_preprocess(onnx, image), repeat))
+
+    if model:
+        expected, _ = legacy_inference(onnx, image)
+        actual, _ = onnx._inference(image)
+        assert np.allclose(expected, actual)
+        repeat = 50
+        report("原推理", *measure(lambda: legacy_inference(onnx, image), repeat))
+        report("缓冲区 + IO binding 推理", *measure(lambda: onnx._inference(image), repeat))
+
+
+if __name__ == "__main__":
+    main()
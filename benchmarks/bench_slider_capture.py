@@ -0,0 +1,76 @@
+"""
+对比滑块背景图三种获取方式经 WebDriver 传输的数据量与 Python 端解码耗时：
+png（toDataURL 的 PNG data URL）、raw（画布原始 RGB 的 base64）、raw416（缩放到模型输入尺寸后的原始 RGB）。
+
+浏览器不可用，PNG 用 PIL 以与 toDataURL 相同的 zlib 默认级别编码；背景图用平滑纹理加噪声
+模拟照片，纯随机像素几乎不可压缩，会高估 PNG 的大小。
+
+用法（在仓库根目录）：python benchmarks/bench_slider_capture.py [宽x高 ...]
+"""
+
+import base64
+import os
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from data_fetcher import base64_to_PLI, rgb_base64_to_array  # noqa: E402
+from onnx import MODEL_INPUT_SIZE  # noqa: E402
+
+
+def photo_like(width, height):
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    channels = [128 + 60 * np.sin(x / (17 + 5 * c)) * np.cos(y / (11 + 3 * c)) + rng.normal(0, 10, (height, width))
+                for c in range(3)]
+    rgb = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+    rgba = np.dstack([rgb, np.full((height, width), 255, dtype=np.uint8)])
+    return Image.fromarray(rgba, "RGBA")
+
+
+def png_payload(image):
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def raw_payload(image, size):
+    """与 SLIDER_RAW_PIXELS_JS 返回的数据相同：[宽, 高, RGB 的 base64]，只在像素数大于 size² 时缩小。"""
+    if size and image.width * image.height > size * size:
+        image = image.resize((size, size))
+    rgb = np.asarray(image)[..., :3]
+    return image.width, image.height, base64.b64encode(rgb.tobytes()).decode()
+
+
+def decode_ms(func, repeat=50):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    sizes = [tuple(int(v) for v in arg.split("x")) for arg in sys.argv[1:]] or [(320, 160), (400, 200), (640, 320)]
+    for width, height in sizes:
+        image = photo_like(width, height)
+        png = png_payload(image)
+        raw = raw_payload(image, None)
+        raw416 = raw_payload(image, MODEL_INPUT_SIZE)
+        png_ms = decode_ms(lambda: np.asarray(base64_to_PLI(png.split(",")[1]).convert("RGB")))
+        raw_ms = decode_ms(lambda: rgb_base64_to_array(raw[2], raw[0], raw[1]))
+        raw416_ms = decode_ms(lambda: rgb_base64_to_array(raw416[2], raw416[0], raw416[1]))
+        print(f"画布 {width}x{height}: png {len(png) / 1024:.0f} KB / 解码 {png_ms:.2f} ms，"
+              f"raw {len(raw[2]) / 1024:.0f} KB / {raw_ms:.2f} ms，"
+              f"raw416 {len(raw416[2]) / 1024:.0f} KB（{raw416[0]}x{raw416[1]}）/ {raw416_ms:.2f} ms")
+    full = MODEL_INPUT_SIZE * MODEL_INPUT_SIZE * 3 * 4 / 3 / 1024
+    print(f"参考：放大到 {MODEL_INPUT_SIZE}x{MODEL_INPUT_SIZE} 的原始 RGB 固定为 {full:.0f} KB。")
+
+
+if __name__ == "__main__":
+    main()
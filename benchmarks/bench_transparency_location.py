@@ -0,0 +1,128 @@
+"""
+对比 get_transparency_location 向量化实现与原逐像素实现的输出与耗时。
+
+用法（在仓库根目录）：python benchmarks/bench_transparency_location.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from data_fetcher import get_transparency_location  # noqa: E402
+
+
+def legacy_get_transparency_location(image):
+    """向量化之前的逐像素实现，作为输出一致性的参照。"""
+    height, width, channel = image.shape
+    assert channel == 4
+    first_location = None
+    last_location = None
+    first_transparency = []
+    last_transparency = []
+    for y, rows in enumerate(image):
+        for x, BGRA in enumerate(rows):
+            alpha = BGRA[3]
+            if alpha != 0:
+                if not first_location or first_location[1] != y:
+                    first_location = (x, y)
+                    first_transparency.append(first_location)
+                last_location = (x, y)
+        if last_location:
+            last_transparency.append(last_location)
+
+    top = first_transparency[0]
+    bottom = first_transparency[-1]
+    left = None
+    right = None
+    for first, last in zip(first_transparency, last_transparency):
+        if not left:
+            left = first
+        if not right:
+            right = last
+        if first[0] < left[0]:
+            left = first
+        if last[0] > right[0]:
+            right = last
+
+    upper_left = (left[0], top[1])
+    bottom_right = (right[0], bottom[1])
+    return upper_left[0], upper_left[1], bottom_right[0], bottom_right[1]
+
+
+def blank(height=160, width=60):
+    return np.zeros((height, width, 4), dtype=np.uint8)
+
+
+def slider_block(height=160, width=60, top=50, size=44):
+    """带凸起的拼图块：中间方块加左侧和上方的半圆。"""
+    image = blank(height, width)
+    yy, xx = np.mgrid[:height, :width]
+    square = (yy >= top) & (yy < top + size) & (xx >= 8) & (xx < 8 + size)
+    bump_top = (yy - top) ** 2 + (xx - 30) ** 2 <= 64
+    bump_left = (yy - top - 22) ** 2 + (xx - 8) ** 2 <= 49
+    hole = (yy - top - 22) ** 2 + (xx - 52) ** 2 <= 36
+    image[..., 3] = ((square | bump_top | bump_left) & ~hole) * 255
+    return image
+
+
+def synthetic_images():
+    rng = np.random.default_rng(0)
+    images = [slider_block(), slider_block(top=0), slider_block(top=116)]
+
+    single = blank()
+    single[80, 30, 3] = 1
+    images.append(single)
+
+    full = blank()
+    full[..., 3] = 255
+    images.append(full)
+
+    # 中间有空行：逐像素实现的右边界只统计前若干行，需保持一致
+    gaps = blank()
+    gaps[10:20, 5:15, 3] = 255
+    gaps[40:45, 20:58, 3] = 255
+    images.append(gaps)
+
+    for density in (0.001, 0.01, 0.3):
+        sparse = blank()
+        sparse[..., 3] = (rng.random(sparse.shape[:2]) < density) * rng.integers(1, 256, sparse.shape[:2])
+        images.append(sparse)
+    return images
+
+
+def check_equal():
+    images = synthetic_images()
+    for i, image in enumerate(images):
+        assert legacy_get_transparency_location(image) == get_transparency_location(image), i
+    for func in (legacy_get_transparency_location, get_transparency_location):
+        try:
+            func(blank())
+        except IndexError:
+            pass
+        else:
+            raise AssertionError("全透明图片应抛出 IndexError")
+    print(f"输出一致性: {len(images)} 张合成图片全部一致，全透明图片均抛出 IndexError")
+
+
+def bench(func, image, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(image)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    check_equal()
+    for height, width in ((160, 60), (320, 120)):
+        image = slider_block(height, width, top=height // 3, size=min(height, width) - 16)
+        legacy_ms = bench(legacy_get_transparency_location, image, 5)
+        new_ms = bench(get_transparency_location, image, 200)
+        print(f"{width}x{height} 滑块: 原实现 {legacy_ms:.2f} ms，向量化 {new_ms:.3f} ms，加速 {legacy_ms / new_ms:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
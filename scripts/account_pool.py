@@ -0,0 +1,91 @@
+"""
+Run several 95598 accounts from one process: accounts come from the ACCOUNTS option and are
+executed by a bounded thread pool, so they share one Firefox pool, one captcha model and
+one Python runtime instead of one add-on container each.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_accounts(phone_number, password):
+    """
+    读取账号列表：ACCOUNTS 为 JSON 数组，每项含 PHONE_NUMBER、PASSWORD，
+    可选 IGNORE_USER_ID（逗号分隔）与 RETRY_TIMES_LIMIT；PHONE_NUMBER/PASSWORD 作为第一个账号。
+    """
+    accounts = []
+    if phone_number:
+        accounts.append({"PHONE_NUMBER": phone_number, "PASSWORD": password})
+    raw = os.getenv("ACCOUNTS", "").strip()
+    if raw:
+        try:
+            extra = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"ACCOUNTS 不是合法的 JSON 数组: {e}")
+        for account in extra:
+            if not account.get("PHONE_NUMBER") or not account.get("PASSWORD"):
+                logging.warning("ACCOUNTS 中存在缺少账号或密码的项，已跳过。")
+                continue
+            if any(a["PHONE_NUMBER"] == account["PHONE_NUMBER"] for a in accounts):
+                continue
+            accounts.append(account)
+    for account in accounts:
+        ignore_user_id = account.get("IGNORE_USER_ID")
+        if isinstance(ignore_user_id, str):
+            account["IGNORE_USER_ID"] = [i for i in ignore_user_id.split(",") if i]
+        if account.get("RETRY_TIMES_LIMIT") is not None:
+            account["RETRY_TIMES_LIMIT"] = int(account["RETRY_TIMES_LIMIT"])
+    return accounts
+
+
+class AccountPool:
+
+    def __init__(self, task, workers=1):
+        """
+        :param task: 执行单个账号任务的函数，参数为 DataFetcher
+        :param workers: 最多同时执行的账号数
+        """
+        self._task = task
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="account")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fetcher, callback=None):
+        """
+        提交一个账号的任务，返回是否已提交；该账号上一轮仍在排队或执行时跳过本轮。
+        callback 在任务结束后于工作线程中调用。
+        """
+        with self._lock:
+            if id(fetcher) in self._pending:
+                logging.warning(f"账号 {fetcher._username} 上一轮任务尚未结束，跳过本轮。")
+                return False
+            self._pending.add(id(fetcher))
+        future = self._executor.submit(self._run, fetcher, callback)
+        future.add_done_callback(lambda _: self._done(fetcher))
+        return True
+
+    def _run(self, fetcher, callback):
+        logging.info(f"账号 {fetcher._username} 开始执行任务。")
+        try:
+            self._task(fetcher)
+        except Exception as e:
+            logging.error(f"账号 {fetcher._username} 任务异常: {e}")
+        logging.info(f"账号 {fetcher._username} 任务结束。")
+        if callback is not None:
+            with self._lock:
+                self._pending.discard(id(fetcher))
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"账号 {fetcher._username} 任务回调异常: {e}")
+
+    def _done(self, fetcher):
+        with self._lock:
+            self._pending.discard(id(fetcher))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,124 @@
+"""
+Firefox tuning for scraping: the "lean" profile blocks what the scraper never looks at
+(third-party hosts, web fonts, media, disk cache, telemetry) and returns from navigation at
+DOMContentLoaded. Page-load timings are recorded per URL so profiles can be compared.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+# 默认放行的域名（含子域名），滑块画布的图片与脚本都来自这里
+DEFAULT_ALLOWED_HOSTS = ["95598.cn"]
+
+# 不在白名单内的域名走一个不存在的代理，连接立即失败
+PAC_TEMPLATE = """
+function FindProxyForURL(url, host) {
+    var allowed = %s;
+    for (var i = 0; i < allowed.length; i++) {
+        if (host === allowed[i] || dnsDomainIs(host, "." + allowed[i])) {
+            return "DIRECT";
+        }
+    }
+    return "PROXY 127.0.0.1:9";
+}
+"""
+
+LEAN_PREFS = {
+    # 只加载同站图片，滑块背景图为同站资源
+    "permissions.default.image": 3,
+    # 不下载网页字体
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    # 禁止音视频自动播放与预加载
+    "media.autoplay.default": 5,
+    "media.preload.default": 0,
+    "media.preload.auto": 0,
+    # 关闭磁盘缓存、离线缓存与往返缓存，保留内存缓存供同一次任务内复用
+    "browser.cache.disk.enable": False,
+    "browser.cache.offline.enable": False,
+    "browser.sessionhistory.max_total_viewers": 0,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    # 关闭与抓取无关的后台请求
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "browser.safebrowsing.downloads.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "toolkit.telemetry.enabled": False,
+    "app.update.auto": False,
+    "extensions.update.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+    "browser.sessionstore.resume_from_crash": False,
+}
+
+
+def allowed_hosts():
+    extra = [h.strip() for h in os.getenv("BROWSER_ALLOWED_HOSTS", "").split(",") if h.strip()]
+    return DEFAULT_ALLOWED_HOSTS + extra
+
+
+def apply_profile(firefox_options, profile):
+    """按 profile（default/lean）调整 Firefox 选项，default 不做任何修改。"""
+    if profile != "lean":
+        return
+    for name, value in LEAN_PREFS.items():
+        firefox_options.set_preference(name, value)
+    pac = PAC_TEMPLATE % json.dumps(allowed_hosts())
+    firefox_options.set_preference("network.proxy.type", 2)
+    firefox_options.set_preference("network.proxy.autoconfig_url", "data:application/x-ns-proxy-autoconfig," + quote(pac))
+    # DOMContentLoaded 后即返回，后续由页面条件等待兜底
+    firefox_options.page_load_strategy = "eager"
+    logging.info(f"使用精简浏览器配置，仅放行域名: {allowed_hosts()}。")
+
+
+NAVIGATION_TIMING_JS = """
+const nav = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+return nav ? [nav.domContentLoadedEventEnd, resources.length,
+              resources.reduce((s, r) => s + (r.transferSize || 0), nav.transferSize || 0)] : null;
+"""
+
+
+class PageLoadTimer:
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._timings = defaultdict(list)
+
+    def get(self, driver, url):
+        """打开 url 并记录 driver.get 用时与页面导航耗时。"""
+        start = time.perf_counter()
+        driver.get(url)
+        elapsed = time.perf_counter() - start
+        timing = {"get": elapsed}
+        try:
+            nav = driver.execute_script(NAVIGATION_TIMING_JS)
+            if nav:
+                timing.update(dom_ready=nav[0] / 1000, resources=nav[1], transfer_kb=nav[2] / 1024)
+        except Exception as e:
+            logging.debug(f"读取页面 {url} 导航耗时失败: {e}")
+        path = urlsplit(url).path
+        with self._lock:
+            self._timings[path].append(timing)
+        logging.debug(
+            f"打开 {path} [{self.profile}] 用时 {elapsed:.2f}s，"
+            f"DOMContentLoaded {timing.get('dom_ready', 0):.2f}s，资源 {timing.get('resources', 0)} 个。")
+
+    def log_report(self):
+        """按 URL 汇总本次任务的页面加载耗时，并清零。"""
+        with self._lock:
+            timings = dict(self._timings)
+            self._timings.clear()
+        for path, items in timings.items():
+            avg = lambda key: sum(t.get(key, 0) for t in items) / len(items)
+            logging.info(
+                f"页面加载 [{self.profile}] {path}: {len(items)} 次，平均用时 {avg('get'):.2f}s，"
+                f"DOMContentLoaded {avg('dom_ready'):.2f}s，资源 {avg('resources'):.0f} 个，{avg('transfer_kb'):.0f} KB。")
@@ -3,6 +3,8 @@
 LOGIN_URL = "https://95598.cn/osgweb/login"
 ELECTRIC_USAGE_URL = "https://95598.cn/osgweb/electricityCharge"
 BALANCE_URL = "https://95598.cn/osgweb/userAcc"
+# 日用电固定抓取近30天，与页面"近30天"标签一致
+DAILY_WINDOW_DAYS = 30
 
 
 # Home Assistant
@@ -2,6 +2,7 @@ import logging
 import os
 import re
 import subprocess
+import threading
 import time
 
 import shutil
@@ -9,7 +10,7 @@ import shutil
 import random
 import base64
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from selenium import webdriver
 from selenium.webdriver import ActionChains
 from selenium.webdriver.edge.service import Service as EdgeService
@@ -20,8 +21,18 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.common.exceptions import TimeoutException
-from sensor_updator import SensorUpdator
+from sensor_updator import SensorUpdator, VOLATILE_ATTRIBUTES
+from push_cache import PushCache
+from ha_statistics import StatisticsImporter
 from error_watcher import ErrorWatcher
+from session_store import SessionStore
+from page_waits import PageWaiter
+from api_client import ApiClient, load_spec
+from tab_workers import run_in_tabs
+from browser_profile import PageLoadTimer, apply_profile
+from snapshot_writer import SnapshotWriter
+from run_report import RunReport, timed
+from metrics import HA_WRITES, LAST_SUCCESS, LOGIN_ATTEMPTS, RUN_DURATION, SLIDER_ATTEMPTS, account_label
 
 from const import *
 
@@ -29,7 +40,7 @@ import numpy as np
 # import cv2
 from io import BytesIO
 from PIL import Image
-from onnx import ONNX
+from onnx import ONNX, MODEL_INPUT_SIZE
 import platform
 
 
@@ -40,74 +51,209 @@ def base64_to_PLI(base64_str: str):
     img = Image.open(image_data)
     return img
 
+def rgb_base64_to_array(base64_str: str, width: int, height: int):
+    """浏览器 getImageData 取出、去掉 alpha 后 base64 编码的原始 RGB 像素转为 HWC uint8 数组。"""
+    byte_data = base64.b64decode(base64_str)
+    return np.frombuffer(byte_data, dtype=np.uint8).reshape(height, width, 3)
+
+# 直接读取滑块背景画布像素，只传 RGB 三通道，跳过 PNG 编解码；传入 size 时，画布像素多于
+# size×size 才在浏览器内缩小到模型输入尺寸（放大只会增加传输量）
+SLIDER_RAW_PIXELS_JS = """
+const src = document.getElementById("slideVerify").childNodes[0];
+const size = arguments[0];
+let canvas = src;
+if (size && src.width * src.height > size * size) {
+    canvas = document.createElement("canvas");
+    canvas.width = size;
+    canvas.height = size;
+    canvas.getContext("2d").drawImage(src, 0, 0, size, size);
+}
+const w = canvas.width, h = canvas.height;
+const rgba = canvas.getContext("2d").getImageData(0, 0, w, h).data;
+const rgb = new Uint8Array(w * h * 3);
+for (let i = 0, j = 0; i < rgba.length; i += 4, j += 3) {
+    rgb[j] = rgba[i]; rgb[j + 1] = rgba[i + 1]; rgb[j + 2] = rgba[i + 2];
+}
+let bin = "";
+for (let i = 0; i < rgb.length; i += 0x8000) {
+    bin += String.fromCharCode.apply(null, rgb.subarray(i, i + 0x8000));
+}
+return [w, h, btoa(bin)];
+"""
+
+# 日用电表格的数据行（不含展开后的详情行），以及行内的展开按钮
+DAILY_ROWS_XPATH = "//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and not(contains(@class,'el-table__expanded-row'))]"
+DAILY_EXPAND_BTN_XPATH = "(.//button[contains(@class,'el-table__expand-icon')] | .//span[contains(@class,'el-table__expand-icon')] | .//div[contains(@class,'el-table__expand-icon')] | .//td[last()]//*[contains(@class,'arrow') or contains(@class,'caret') or contains(@class,'el-icon')])[1]"
+
+# 一次异步脚本展开所有日数据行，等详情渲染后返回每行的日期、总用电与谷/平/峰/尖文本；
+# clicked 表示该行已被点开（或本已展开），逐行兜底时不能再点，否则会收起详情
+DAILY_BULK_EXTRACT_JS = """
+const [rowsXPath, expandXPath, timeoutMs, skipDates, done] = arguments;
+const snapshot = (xpath, context) => {
+    const result = document.evaluate(xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    return Array.from({length: result.snapshotLength}, (_, i) => result.snapshotItem(i));
+};
+const detailCell = row => {
+    const next = row.nextElementSibling;
+    return next ? next.querySelector("td.el-table__expanded-cell") : null;
+};
+const ownText = e => Array.from(e.childNodes).filter(n => n.nodeType === Node.TEXT_NODE).map(n => n.textContent).join("");
+const number = text => { const m = /([0-9]+\\.?[0-9]*)/.exec(text || ""); return m ? m[1] : null; };
+const extract = (cell, label, keyword) => {
+    for (const p of cell.querySelectorAll(".drop-box-left p")) {
+        if (!Array.from(p.querySelectorAll("*")).some(e => ownText(e).includes(label))) continue;
+        for (const span of p.querySelectorAll("span[class*='num']")) {
+            const value = number(span.innerText);
+            if (value !== null) return value;
+        }
+    }
+    for (const e of cell.querySelectorAll("*")) {
+        if (!ownText(e).includes(keyword)) continue;
+        const value = number(e.innerText);
+        if (value !== null) return value;
+    }
+    return null;
+};
+
+const rowText = (row, xpath) => { const e = snapshot(xpath, row)[0]; return e ? e.innerText.trim() : null; };
+const allRows = snapshot(rowsXPath, document);
+// 已入库且分时完整的日期不展开
+const skipped = new Set(allRows.filter(row => skipDates.includes(rowText(row, "td[1]/div"))));
+const rows = allRows.filter(row => !skipped.has(row));
+const clicked = new Set();
+for (const row of rows) {
+    if (detailCell(row)) { clicked.add(row); continue; }
+    const button = snapshot(expandXPath, row)[0];
+    if (button) { button.click(); clicked.add(row); }
+}
+const ready = () => rows.every(row => {
+    const cell = detailCell(row);
+    return cell && cell.querySelector(".drop-box-left p");
+});
+const deadline = Date.now() + timeoutMs;
+const poll = () => {
+    if (!ready() && Date.now() < deadline) { setTimeout(poll, 100); return; }
+    done(allRows.map(row => {
+        const date = rowText(row, "td[1]/div"), total = rowText(row, "td[2]/div");
+        if (skipped.has(row)) return {date, total, skipped: true, expanded: false, clicked: false};
+        const cell = detailCell(row);
+        const values = {
+            valley: cell ? extract(cell, "谷", "谷用电") : null,
+            flat: cell ? extract(cell, "平", "平用电") : null,
+            peak: cell ? extract(cell, "峰", "峰用电") : null,
+            sharp: cell ? extract(cell, "尖", "尖用电") : null,
+        };
+        // 四项都取到才算展开成功，否则交给逐行解析
+        const expanded = Object.values(values).every(value => value !== null);
+        return {date, total, skipped: false, expanded, clicked: clicked.has(row), ...values};
+    }));
+};
+poll();
+"""
+
+def _element_shown(by, key):
+    """等待条件：存在可见的匹配元素。"""
+    return lambda driver: any(e.is_displayed() for e in driver.find_elements(by, key))
+
 def get_transparency_location(image):
     '''获取基于透明元素裁切图片的左上角、右下角坐标
 
+    目前登录流程只用 ONNX 模型识别背景图缺口，不调用本函数；保留给拼图块
+    （slide-verify-block 画布）定位使用，benchmarks/bench_transparency_location.py 校验其结果。
+
     :param image: cv2加载好的图像
     :return: (left, upper, right, lower)元组
     '''
-    # 1. 扫描获得最左边透明点和最右边透明点坐标
     height, width, channel = image.shape  # 高、宽、通道数
     assert channel == 4  # 无透明通道报错
-    first_location = None  # 最先遇到的透明点
-    last_location = None  # 最后遇到的透明点
-    first_transparency = []  # 从左往右最先遇到的透明点，元素个数小于等于图像高度
-    last_transparency = []  # 从左往右最后遇到的透明点，元素个数小于等于图像高度
-    for y, rows in enumerate(image):
-        for x, BGRA in enumerate(rows):
-            alpha = BGRA[3]
-            if alpha != 0:
-                if not first_location or first_location[1] != y:  # 透明点未赋值或为同一列
-                    first_location = (x, y)  # 更新最先遇到的透明点
-                    first_transparency.append(first_location)
-                last_location = (x, y)  # 更新最后遇到的透明点
-        if last_location:
-            last_transparency.append(last_location)
-
-    # 2. 矩形四个边的中点
-    top = first_transparency[0]
-    bottom = first_transparency[-1]
-    left = None
-    right = None
-    for first, last in zip(first_transparency, last_transparency):
-        if not left:
-            left = first
-        if not right:
-            right = last
-        if first[0] < left[0]:
-            left = first
-        if last[0] > right[0]:
-            right = last
-
-    # 3. 左上角、右下角
-    upper_left = (left[0], top[1])  # 左上角
-    bottom_right = (right[0], bottom[1])  # 右下角
-
-    return upper_left[0], upper_left[1], bottom_right[0], bottom_right[1]
+    # 1. 按行归约得到含非透明点的行，以及每行最左、最右的非透明点
+    opaque = image[..., 3] != 0
+    rows = np.flatnonzero(opaque.any(axis=1))
+    upper = rows[0]  # 没有非透明点时与逐像素实现一样抛出 IndexError
+    lower = rows[-1]
+    row_masks = opaque[rows]
+    first_x = row_masks.argmax(axis=1)
+    last_x = width - 1 - row_masks[:, ::-1].argmax(axis=1)
+
+    # 2. 左边取各行最左点的最小值；右边与逐像素实现保持一致：
+    #    只统计从首个非透明行起、行数等于非透明行数的范围（中间有空行时下方的行不参与）
+    left = first_x.min()
+    right = last_x[rows <= upper + len(rows) - 1].max()
+
+    return int(left), int(upper), int(right), int(lower)
 
 class DataFetcher:
 
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, driver_pool=None, onnx=None, ignore_user_id=None, retry_times_limit=None, ha_client=None, push_cache=None, statistics=None, outbox=None):
+        """
+        :param onnx: 多账号时共用的验证码模型，为空时自行加载
+        :param ha_client: 多账号时共用的 HAClient（连接池），为空时每次任务新建
+        :param push_cache: 多账号时共用的 PushCache，为空时按 HA_SKIP_UNCHANGED 自行创建
+        :param statistics: 多账号时共用的 StatisticsImporter，为空时按 STATISTICS_IMPORT 自行创建
+        :param outbox: 主程序持有的 Outbox（含后台补推线程），为空时推送失败只记录日志
+        :param ignore_user_id: 本账号忽略的户号列表，为空时读取 IGNORE_USER_ID
+        :param retry_times_limit: 本账号滑块重试次数，为空时读取 RETRY_TIMES_LIMIT
+        """
         if 'PYTHON_IN_DOCKER' not in os.environ: 
             import dotenv
             dotenv.load_dotenv(verbose=True)
         self._username = username
         self._password = password
-        self.onnx = ONNX("./captcha.onnx")
+        # 可选的浏览器池（driver_pool.DriverPool），为空时每次任务新建并关闭浏览器
+        self.driver_pool = driver_pool
+        self.onnx = onnx if onnx is not None else ONNX("./captcha.onnx")
+        self.ha_client = ha_client
+        self.push_cache = push_cache if push_cache is not None else PushCache.from_env(volatile_attributes=VOLATILE_ATTRIBUTES)
+        self.statistics = statistics if statistics is not None else StatisticsImporter.from_env(ha_client)
+        self.outbox = outbox
 
         # 获取 ENABLE_DATABASE_STORAGE 的值，默认为 False
         self.enable_database_storage = os.getenv("ENABLE_DATABASE_STORAGE", "false").lower() == "true"
         self.DRIVER_IMPLICITY_WAIT_TIME = int(os.getenv("DRIVER_IMPLICITY_WAIT_TIME", 60))
-        self.RETRY_TIMES_LIMIT = int(os.getenv("RETRY_TIMES_LIMIT", 5))
+        self.RETRY_TIMES_LIMIT = retry_times_limit or int(os.getenv("RETRY_TIMES_LIMIT", 5))
         self.LOGIN_EXPECTED_TIME = int(os.getenv("LOGIN_EXPECTED_TIME", 10))
         self.RETRY_WAIT_TIME_OFFSET_UNIT = int(os.getenv("RETRY_WAIT_TIME_OFFSET_UNIT", 10))
         # Faster waits for inner table expansion to avoid long per-row delays
         self.DETAIL_WAIT_TIME = max(1, min(self.RETRY_WAIT_TIME_OFFSET_UNIT, 3))
+        # 一次脚本批量展开并解析日用电表格，失败时退回逐行解析
+        self.DAILY_BULK_EXTRACT = os.getenv("DAILY_BULK_EXTRACT", "true").lower() == "true"
         # 等待滑块图片加载时间，防止空白导致 distance=0
         self.SLIDER_IMAGE_WAIT = max(1, min(self.RETRY_WAIT_TIME_OFFSET_UNIT, 5))
+        # 滑块背景图获取方式：png（toDataURL）、raw（原始像素）、raw416（画布大于模型尺寸时先在浏览器内缩小的原始像素）
+        self.SLIDER_CAPTURE_MODE = os.getenv("SLIDER_CAPTURE_MODE", "png").lower()
+        # 用页面条件（加载遮罩消失、请求结束、目标元素出现）代替固定等待，原等待时间作为上限
+        self.waiter = PageWaiter(
+            self.DRIVER_IMPLICITY_WAIT_TIME,
+            enabled=os.getenv("WAIT_MODE", "event").lower() == "event",
+        )
         self.SNAPSHOT_DIR = "/config/gwkz"
-        self.snapshot_session_dir = None
-        self.IGNORE_USER_ID = os.getenv("IGNORE_USER_ID", "xxxxx,xxxxx").split(",")
+        # 截图在后台线程编码写盘，按级别过滤并限制总占用空间
+        self.snapshots = SnapshotWriter.from_env(self.SNAPSHOT_DIR)
+        # 本次任务的分阶段耗时，fetch 开始时创建
+        self.report = None
+        # 当前任务使用的浏览器，超时终止时由看门狗关闭
+        self._current_driver = None
+        self.aborted = False
+        # 本次任务各户号抓到的最新日数据日期，供按数据更新情况调度
+        self.last_daily_dates = {}
+        # 本次任务各户号的日记录，推送状态后导入长期统计
+        self._daily_records = {}
+        self.IGNORE_USER_ID = ignore_user_id if ignore_user_id is not None else os.getenv("IGNORE_USER_ID", "xxxxx,xxxxx").split(",")
+        # 数据来源：dom 抓取页面；api 登录后直接调用 JSON 接口（需接口描述文件，失败时回退到页面）
+        self.DATA_SOURCE = os.getenv("DATA_SOURCE", "dom").lower()
+        self.DATA_RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS", 30))
+        # 增量抓取：数据库中谷/平/峰/尖已完整的日期不再展开详情（需启用数据库持久化）
+        self.DAILY_INCREMENTAL = os.getenv("DAILY_INCREMENTAL", "false").lower() == "true"
+        # 同一登录会话内并发抓取的标签页数，1 表示逐个户号顺序抓取
+        self.PARALLEL_TABS = max(1, int(os.getenv("PARALLEL_TABS", 1)))
+        # 并发标签页共用本对象，数据库写入需串行
+        self._db_lock = threading.Lock()
+        # 复用上次登录保存的 cookies/localStorage，失效时才走完整登录
+        self.SESSION_REUSE = os.getenv("SESSION_REUSE", "true").lower() == "true"
+        # 浏览器配置：default 为原配置；lean 屏蔽第三方域名、字体、媒体与磁盘缓存，并在 DOMContentLoaded 后返回
+        self.BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "default").lower()
+        self.page_timer = PageLoadTimer(self.BROWSER_PROFILE)
+        self.session_store = SessionStore(username, password)
 
     # @staticmethod
     def _click_button(self, driver, button_search_type, button_search_key):
@@ -140,14 +286,18 @@ class DataFetcher:
         ActionChains(driver).move_by_offset(xoffset=distance, yoffset=yoffset_random).perform()
         ActionChains(driver).release().perform()
 
+    def _db_path(self):
+        DB_NAME = os.getenv("DB_NAME", "homeassistant.db")
+        if 'PYTHON_IN_DOCKER' in os.environ: 
+            DB_NAME = "/data/" + DB_NAME
+        return DB_NAME
+
     def connect_user_db(self, user_id):
         """创建数据库集合，db_name = electricity_daily_usage_{user_id}
         :param user_id: 用户ID"""
         try:
             # 创建数据库
-            DB_NAME = os.getenv("DB_NAME", "homeassistant.db")
-            if 'PYTHON_IN_DOCKER' in os.environ: 
-                DB_NAME = "/data/" + DB_NAME
+            DB_NAME = self._db_path()
             self.connect = sqlite3.connect(DB_NAME)
             self.connect.cursor()
             logging.info(f"数据库 {DB_NAME} 创建成功。")
@@ -166,6 +316,17 @@ class DataFetcher:
                     value TEXT NOT NULL)'''
             self.connect.execute(sql)
             logging.info(f"扩展表 {self.table_expand_name} 创建成功。")
+
+            # 创建分时表，增量抓取据此跳过已完整入库的日期
+            self.table_tou_name = f"tou{user_id}"
+            sql = f'''CREATE TABLE IF NOT EXISTS {self.table_tou_name} (
+                    date DATE PRIMARY KEY NOT NULL,
+                    total REAL,
+                    valley REAL,
+                    flat REAL,
+                    peak REAL,
+                    sharp REAL)'''
+            self.connect.execute(sql)
 			
         # 如果表已存在，则不会创建
         except sqlite3.Error as e:
@@ -196,6 +357,38 @@ class DataFetcher:
             self.connect.commit()
         except BaseException as e:
             logging.debug(f"数据写入失败: {e}")
+
+    def insert_tou_data(self, record:dict):
+        if self.connect is None:
+            logging.error("数据库连接未建立。")
+            return
+        try:
+            sql = f"INSERT OR REPLACE INTO {self.table_tou_name} VALUES(?,?,?,?,?,?);"
+            self.connect.execute(sql, tuple(record.get(k) for k in ("date", "total", "valley", "flat", "peak", "sharp")))
+            self.connect.commit()
+        except BaseException as e:
+            logging.debug(f"分时数据写入失败: {e}")
+
+    def load_stored_tou(self, user_id, days):
+        """读取近 days 天内谷/平/峰/尖均已入库的日记录，返回 {日期: 记录}，没有数据库或表时返回空。"""
+        DB_NAME = self._db_path()
+        if not os.path.isfile(DB_NAME):
+            return {}
+        since = (datetime.now() - timedelta(days=days + 1)).strftime("%Y-%m-%d")
+        try:
+            connect = sqlite3.connect(DB_NAME)
+            try:
+                rows = connect.execute(
+                    f"SELECT date, total, valley, flat, peak, sharp FROM tou{user_id} WHERE date >= ? "
+                    "AND valley IS NOT NULL AND flat IS NOT NULL AND peak IS NOT NULL AND sharp IS NOT NULL;",
+                    (since,)).fetchall()
+            finally:
+                connect.close()
+        except sqlite3.Error as e:
+            logging.debug(f"读取户号 {user_id} 已入库分时数据失败: {e}")
+            return {}
+        keys = ("date", "total", "valley", "flat", "peak", "sharp")
+        return {row[0]: dict(zip(keys, row)) for row in rows}
                 
     def _get_webdriver(self):
         if platform.system() == 'Windows':
@@ -208,6 +401,7 @@ class DataFetcher:
             firefox_options.add_argument('--no-sandbox')
             firefox_options.add_argument('--disable-gpu')
             firefox_options.add_argument('--disable-dev-shm-usage')
+            apply_profile(firefox_options, self.BROWSER_PROFILE)
             logging.info(f"启动 Firefox 浏览器。\r")
             gecko_path = os.getenv("GECKODRIVER_PATH") or shutil.which("geckodriver") or "/usr/local/bin/geckodriver"
             if not os.path.exists(gecko_path):
@@ -216,35 +410,59 @@ class DataFetcher:
             driver.implicitly_wait(self.DRIVER_IMPLICITY_WAIT_TIME)
         return driver
 
-    def _dump_snapshot(self, driver, prefix: str):
-        """保存当前页面截图到 /config/gwkz，便于调试。"""
+    @timed("get_webdriver")
+    def _acquire_driver(self):
+        if self.driver_pool is not None:
+            driver = self.driver_pool.acquire()
+        else:
+            driver = self._get_webdriver()
+        self._current_driver = driver
+        return driver
+
+    def _release_driver(self, driver, discard=False):
+        """任务结束归还浏览器：使用浏览器池时放回池中，否则直接关闭；已被终止的浏览器一律回收。"""
+        if driver is self._current_driver:
+            self._current_driver = None
+        if self.driver_pool is not None:
+            self.driver_pool.release(driver, discard=discard or self.aborted)
+        else:
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.debug(f"关闭浏览器失败: {e}")
+
+    def abort(self):
+        """终止当前任务：关闭正在使用的浏览器，后续浏览器操作会立即失败，任务随之退出。"""
+        self.aborted = True
+        driver = self._current_driver
+        if driver is None:
+            return
         try:
-            base_dir = self.snapshot_session_dir or self.SNAPSHOT_DIR
-            os.makedirs(base_dir, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-            png_path = os.path.join(base_dir, f"{prefix}_{ts}.png")
-            driver.save_screenshot(png_path)
-            logging.info(f"已保存页面截图: {png_path}")
+            driver.quit()
         except Exception as e:
-            logging.debug(f"保存页面截图失败: {e}")
+            logging.debug(f"终止任务时关闭浏览器失败: {e}")
+
+    def _dump_snapshot(self, driver, prefix: str, error=False):
+        """保存当前页面截图到 /config/gwkz，便于调试；error 表示出错时的截图，SNAPSHOT_LEVEL=errors 时只保存这类。"""
+        self.snapshots.capture(driver, prefix, error)
 
     def _restore_login_context(self, driver):
         """刷新后重新回到账号密码登录并填充表单、点击登录，避免停留在扫码页。"""
         try:
-            driver.get(LOGIN_URL)
-            time.sleep(self.DETAIL_WAIT_TIME)
+            self.page_timer.get(driver, LOGIN_URL)
+            self.waiter.wait(driver, "restore_login_page", self.DETAIL_WAIT_TIME, _element_shown(By.CLASS_NAME, "user"))
             driver.find_element(By.CLASS_NAME, "user").click()
-            time.sleep(2)
+            self.waiter.wait(driver, "restore_login_tab", 2)
             self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[1]/div[1]/div[2]/span')
-            time.sleep(2)
+            self.waiter.wait(driver, "restore_login_agree", 2)
             self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[2]/div[1]/form/div[1]/div[3]/div/span[2]')
-            time.sleep(2)
+            self.waiter.wait(driver, "restore_login_form", 2)
             inputs = driver.find_elements(By.CLASS_NAME, "el-input__inner")
             if len(inputs) >= 2:
                 inputs[0].clear(); inputs[0].send_keys(self._username)
                 inputs[1].clear(); inputs[1].send_keys(self._password)
             self._click_button(driver, By.CLASS_NAME, "el-button.el-button--primary")
-            time.sleep(self.DETAIL_WAIT_TIME)
+            self.waiter.wait(driver, "restore_login_submit", self.DETAIL_WAIT_TIME, _element_shown(By.ID, "slideVerify"))
             logging.info("刷新后已回到账密登录并重新点击登录，等待滑块。")
         except Exception as e:
             logging.warning(f"刷新后恢复登录环境失败: {e}")
@@ -268,24 +486,78 @@ class DataFetcher:
         except TimeoutException:
             return False
 
+    def _get_slider_background(self, driver):
+        """获取滑块背景图，raw 模式返回 RGB 数组，失败时回退到 PNG。"""
+        if self.SLIDER_CAPTURE_MODE in ("raw", "raw416"):
+            try:
+                size = MODEL_INPUT_SIZE if self.SLIDER_CAPTURE_MODE == "raw416" else None
+                width, height, data = driver.execute_script(SLIDER_RAW_PIXELS_JS, size)
+                return rgb_base64_to_array(data, width, height)
+            except Exception as e:
+                logging.warning(f"读取滑块画布原始像素失败，改用 PNG: {e}")
+        #get canvas image
+        background_JS = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
+        # targe_JS = 'return document.getElementsByClassName("slide-verify-block")[0].toDataURL("image/png");'
+        # get base64 image data
+        im_info = driver.execute_script(background_JS) 
+        background = im_info.split(',')[1]  
+        return base64_to_PLI(background)
+
+    @timed("restore_session")
+    def _restore_session(self, driver):
+        """恢复已保存的登录状态并校验是否仍然有效。"""
+        if not self.SESSION_REUSE:
+            return False
+        state = self.session_store.load()
+        if not state:
+            return False
+        try:
+            # cookie 只能写入当前域名，先打开登录页
+            self.page_timer.get(driver, LOGIN_URL)
+            self.session_store.apply(driver, state)
+            self.page_timer.get(driver, BALANCE_URL)
+            # 会话失效时页面会跳回登录页，有效时出现户号下拉框；
+            # 轮询期间关闭隐式等待，否则每次 find_elements 找不到元素都要阻塞满隐式等待时间
+            driver.implicitly_wait(0)
+            try:
+                WebDriverWait(driver, max(self.LOGIN_EXPECTED_TIME, self.DETAIL_WAIT_TIME)).until(
+                    lambda d: LOGIN_URL in d.current_url or d.find_elements(By.CLASS_NAME, "el-dropdown")
+                )
+                if LOGIN_URL not in driver.current_url and self._is_logged_in(driver):
+                    return True
+            finally:
+                driver.implicitly_wait(self.DRIVER_IMPLICITY_WAIT_TIME)
+        except Exception as e:
+            logging.debug(f"恢复登录状态失败: {e}")
+        logging.info("保存的登录状态已失效，重新登录。")
+        self.session_store.clear()
+        driver.delete_all_cookies()
+        return False
+
+    def _record_slider_attempt(self, attempt_start, ok):
+        self.report.record("slider_attempt", time.perf_counter() - attempt_start, ok=ok, start=attempt_start)
+        SLIDER_ATTEMPTS.labels(account_label(self._username), "pass" if ok else "fail").inc()
+
+    @timed("login")
     @ErrorWatcher.watch
     def _login(self, driver, phone_code = False):
+        LOGIN_ATTEMPTS.labels(account_label(self._username)).inc()
         try:
-            driver.get(LOGIN_URL)
+            self.page_timer.get(driver, LOGIN_URL)
             logging.info(f"打开登录页 {LOGIN_URL}。\r")
             WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of_element_located((By.CLASS_NAME, "user")))
         except:
             logging.debug(f"登录页打开失败，无法访问 {LOGIN_URL}。")
-        time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.waiter.wait(driver, "login_page", self.RETRY_WAIT_TIME_OFFSET_UNIT, _element_shown(By.CLASS_NAME, "user"))
         # swtich to username-password login page
         driver.find_element(By.CLASS_NAME, "user").click()
         logging.info("切换到账号密码登录页。\r")
         self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[1]/div[1]/div[2]/span')
-        time.sleep(3)
+        self.waiter.wait(driver, "login_tab", 3)
         # click agree button
         self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[2]/div[1]/form/div[1]/div[3]/div/span[2]')
         logging.info("点击同意协议。\r")
-        time.sleep(2)
+        self.waiter.wait(driver, "login_agree", 2)
         if phone_code:
             self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[1]/div[1]/div[3]/span')
             input_elements = driver.find_elements(By.CLASS_NAME, "el-input__inner")
@@ -297,7 +569,7 @@ class DataFetcher:
             logging.info(f"输入短信验证码: {code}.\r")
             # click login button
             self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[2]/div[2]/form/div[2]/div/button/span')
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
+            self.waiter.wait(driver, "phone_login", self.RETRY_WAIT_TIME_OFFSET_UNIT*2, lambda d: self._is_logged_in(d))
             logging.info("点击登录按钮。\r")
 
             return True
@@ -312,9 +584,14 @@ class DataFetcher:
             # click login button
             self._click_button(driver, By.CLASS_NAME, "el-button.el-button--primary")
             logging.info("点击登录按钮，等待滑块图片加载\r")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            self.waiter.wait(driver, "slider_load", self.RETRY_WAIT_TIME_OFFSET_UNIT, _element_shown(By.ID, "slideVerify"))
             # sometimes ddddOCR may fail, so add retry logic)
+            attempt_start = None
             for retry_times in range(1, self.RETRY_TIMES_LIMIT + 1):
+                if attempt_start is not None:
+                    self._record_slider_attempt(attempt_start, ok=False)
+                attempt_start = time.perf_counter()
+                self.report.count("slider_attempts")
                 self._dump_snapshot(driver, f"slider_attempt_{retry_times}")
                 logging.info(f"开始滑块尝试 {retry_times}/{self.RETRY_TIMES_LIMIT}。")
                 # 进入滑块模式前先确认入口存在，避免元素缺失导致报错
@@ -342,15 +619,9 @@ class DataFetcher:
                     logging.warning(f"滑块弹窗未出现，刷新重试: {modal_err}")
                     self._restore_login_context(driver)
                     continue
-                time.sleep(1)
-
-                #get canvas image
-                background_JS = 'return document.getElementById("slideVerify").childNodes[0].toDataURL("image/png");'
-                # targe_JS = 'return document.getElementsByClassName("slide-verify-block")[0].toDataURL("image/png");'
-                # get base64 image data
-                im_info = driver.execute_script(background_JS) 
-                background = im_info.split(',')[1]  
-                background_image = base64_to_PLI(background)
+                self.waiter.wait(driver, "slider_image", 1)
+
+                background_image = self._get_slider_background(driver)
                 logging.info(f"获取滑块背景图成功。\r")
                 distance = self.onnx.get_distance(background_image)
                 logging.info(f"识别滑块缺口距离: {distance}。\r")
@@ -373,7 +644,7 @@ class DataFetcher:
                                 continue
                         if refresh_btn:
                             driver.execute_script("arguments[0].click();", refresh_btn)
-                            time.sleep(self.SLIDER_IMAGE_WAIT)
+                            self.waiter.wait(driver, "slider_refresh", self.SLIDER_IMAGE_WAIT)
                         else:
                             logging.debug("未找到刷新按钮，改为重新加载登录页。")
                             self._restore_login_context(driver)
@@ -383,10 +654,11 @@ class DataFetcher:
                     continue
 
                 self._sliding_track(driver, round(distance*1.06)) #1.06是补偿
-                time.sleep(2)
+                self.waiter.wait(driver, "slider_release", 2)
                 logging.info("已拖动滑块，检查登录结果。")
                 if self._wait_login_success(driver):
                     logging.info("滑块验证通过，检测到登录成功。")
+                    self._record_slider_attempt(attempt_start, ok=True)
                     self._dump_snapshot(driver, "after_login_success")
                     return True
 
@@ -394,12 +666,14 @@ class DataFetcher:
                 try:
                     logging.info("滑块校验失败或未跳转，尝试重新点击登录再试。\r")
                     self._click_button(driver, By.CLASS_NAME, "el-button.el-button--primary")
-                    time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                    self.waiter.wait(driver, "login_retry", self.RETRY_WAIT_TIME_OFFSET_UNIT, _element_shown(By.ID, "slideVerify"))
                 except Exception:
                     logging.error(
                         f"重新点击登录失败，刷新页面重试，剩余 {self.RETRY_TIMES_LIMIT - retry_times} 次重试。")
                     self._restore_login_context(driver)
                 continue
+            if attempt_start is not None:
+                self._record_slider_attempt(attempt_start, ok=False)
             logging.error(f"登录失败，可能因滑块校验未通过。")
         return False
 
@@ -410,114 +684,241 @@ class DataFetcher:
 
         """main logic here"""
 
-        driver = self._get_webdriver()
-        ErrorWatcher.instance().set_driver(driver)
-
-        # 为本次任务创建独立截图目录
-        self.snapshot_session_dir = os.path.join(
-            self.SNAPSHOT_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        )
-        os.makedirs(self.snapshot_session_dir, exist_ok=True)
-        
-        driver.maximize_window() 
-        logging.info("浏览器驱动初始化完成。")
-        updator = SensorUpdator()
-        
+        self.report = RunReport(self._username)
+        self.aborted = False
+        self.last_daily_dates = {}
+        self._daily_records = {}
+        status = "error"
         try:
-            if os.getenv("DEBUG_MODE", "false").lower() == "true":
-                if self._login(driver,phone_code=True):
-                    logging.info("登录成功！")
-                else:
-                    logging.info("登录失败！")
-                    raise Exception("login unsuccessed")
-            else:
-                if self._login(driver):
-                    logging.info("登录成功！")
+            status = "success" if self._fetch() else "login_failed"
+        finally:
+            if self.aborted:
+                status = "timeout"
+            report = self.report.write(status)
+            RUN_DURATION.labels(account_label(self._username), status).observe(report["duration"])
+        return status
+
+    def _fetch(self):
+        """登录并抓取全部户号，登录失败返回 False。"""
+        driver = self._acquire_driver()
+        # 任何异常都要归还浏览器，否则浏览器池名额泄漏，下次任务会一直等待
+        discard = True
+        try:
+            ErrorWatcher.instance().set_driver(driver)
+
+            # 为本次任务创建独立截图目录
+            self.snapshots.start_run(self._username[-4:])
+
+            driver.maximize_window()
+            logging.info("浏览器驱动初始化完成。")
+            updator = SensorUpdator(self.ha_client, self.push_cache, self.outbox)
+
+            try:
+                if self._restore_session(driver):
+                    logging.info("已复用保存的登录状态，跳过登录与滑块。")
+                elif os.getenv("DEBUG_MODE", "false").lower() == "true":
+                    if self._login(driver,phone_code=True):
+                        logging.info("登录成功！")
+                    else:
+                        logging.info("登录失败！")
+                        raise Exception("login unsuccessed")
                 else:
-                    logging.info("登录失败！")
-                    raise Exception("login unsuccessed")
-        except Exception as e:
-            logging.error(
-                f"浏览器异常退出，原因: {e}，剩余 {self.RETRY_TIMES_LIMIT} 次重试。")
-            driver.quit()
-            return
+                    if self._login(driver):
+                        logging.info("登录成功！")
+                    else:
+                        logging.info("登录失败！")
+                        raise Exception("login unsuccessed")
+                if self.SESSION_REUSE:
+                    self.session_store.save(driver)
+            except Exception as e:
+                logging.error(
+                    f"浏览器异常退出，原因: {e}，剩余 {self.RETRY_TIMES_LIMIT} 次重试。")
+                return False
 
-        logging.info(f"已登录: {LOGIN_URL}")
-        logging.info(f"开始获取户号列表。")
-        user_id_list = self._get_user_ids(driver)
-        logging.info(f"共 {len(user_id_list)} 个户号: {user_id_list}，其中 {self.IGNORE_USER_ID} 将被忽略。")
-
-
-        for userid_index, user_id in enumerate(user_id_list):           
-            try: 
-                # switch to electricity charge balance page
-                driver.get(BALANCE_URL) 
-                time.sleep(1)
-                self._choose_current_userid(driver,userid_index)
-                time.sleep(1)
-                current_userid = self._get_current_userid(driver)
-                if current_userid in self.IGNORE_USER_ID:
-                    logging.info(f"户号 {current_userid} 在忽略列表中，跳过。")
-                    continue
-                ### get data 
-                balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, month_charge, month_usage, yesterday_tou, month_tou, first_day_history  = self._get_all_data(driver, user_id, userid_index)
-                updator.update_one_userid(
-                    user_id,
-                    balance,
-                    last_daily_date,
-                    last_daily_usage,
-                    yearly_charge,
-                    yearly_usage,
-                    month_charge,
-                    month_usage,
-                    yesterday_tou,
-                    month_tou,
-                    first_day_history,
+            logging.info(f"已登录: {LOGIN_URL}")
+            logging.info(f"开始获取户号列表。")
+            user_id_list = self._get_user_ids(driver)
+            logging.info(f"共 {len(user_id_list)} 个户号: {user_id_list}，其中 {self.IGNORE_USER_ID} 将被忽略。")
+
+            api_client = self._get_api_client(driver) if self.DATA_SOURCE == "api" else None
+
+            if self.PARALLEL_TABS > 1 and len(user_id_list) > 1:
+                run_in_tabs(
+                    driver,
+                    list(enumerate(user_id_list)),
+                    lambda tab_driver, item: self._fetch_one_user(tab_driver, updator, api_client, *item, len(user_id_list)),
+                    self.PARALLEL_TABS,
+                    self.DRIVER_IMPLICITY_WAIT_TIME,
                 )
+            else:
+                for userid_index, user_id in enumerate(user_id_list):
+                    self._fetch_one_user(driver, updator, api_client, userid_index, user_id, len(user_id_list))
+
+            self.waiter.log_report()
+            self.page_timer.log_report()
+            discard = False
+            return True
+        finally:
+            ErrorWatcher.instance().set_driver(None)
+            self._release_driver(driver, discard=discard)
 
-                time.sleep(1)
-            except Exception as e:
-                if (userid_index != len(user_id_list)):
-                    logging.info(f"户号 {user_id} 拉取失败 {e}，继续下一个。")
-                else:
-                    logging.info(f"户号 {user_id} 拉取失败，错误: {e}")
-                    logging.info("数据拉取结束，关闭浏览器。")
-                continue    
 
-        driver.quit()
+    def _fetch_one_user(self, driver, updator, api_client, userid_index, user_id, user_count):
+        """拉取单个户号的数据并推送到 HA，异常只记录日志。"""
+        if self.aborted:
+            return
+        user_start = time.perf_counter()
+        ok = True
+        try: 
+            if api_client is not None:
+                if user_id in self.IGNORE_USER_ID:
+                    logging.info(f"户号 {user_id} 在忽略列表中，跳过。")
+                    self.report.count("users_ignored")
+                    return
+                try:
+                    user_data = self._get_all_data_from_api(api_client, user_id)
+                except Exception as api_err:
+                    logging.warning(f"户号 {user_id} 接口获取失败，改用页面抓取: {api_err}")
+                    user_data = None
+                if user_data is not None:
+                    self._push_user(updator, user_id, *user_data)
+                    self.last_daily_dates[user_id] = user_data[1]
+                    return
+            # switch to electricity charge balance page
+            self.page_timer.get(driver, BALANCE_URL) 
+            self.waiter.wait(driver, "balance_page", 1)
+            self._choose_current_userid(driver,userid_index)
+            self.waiter.wait(driver, "balance_userid", 1)
+            current_userid = self._get_current_userid(driver)
+            # 并发标签页共用同一登录会话，户号选择可能被其他标签页改动，不一致时不能把数据记到本户号
+            if current_userid != user_id:
+                raise Exception(f"页面当前户号 {current_userid} 与待抓取户号 {user_id} 不一致")
+            if current_userid in self.IGNORE_USER_ID:
+                logging.info(f"户号 {current_userid} 在忽略列表中，跳过。")
+                self.report.count("users_ignored")
+                return
+            ### get data 
+            balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, month_charge, month_usage, yesterday_tou, month_tou, first_day_history  = self._get_all_data(driver, user_id, userid_index)
+            self._push_user(
+                updator,
+                user_id,
+                balance,
+                last_daily_date,
+                last_daily_usage,
+                yearly_charge,
+                yearly_usage,
+                month_charge,
+                month_usage,
+                yesterday_tou,
+                month_tou,
+                first_day_history,
+            )
+            self.last_daily_dates[user_id] = last_daily_date
 
+            self.waiter.wait(driver, "next_userid", 1)
+        except Exception as e:
+            ok = False
+            self.report.count("users_failed")
+            if (userid_index != user_count):
+                logging.info(f"户号 {user_id} 拉取失败 {e}，继续下一个。")
+            else:
+                logging.info(f"户号 {user_id} 拉取失败，错误: {e}")
+                logging.info("数据拉取结束，关闭浏览器。")
+        finally:
+            self.report.record("user", time.perf_counter() - user_start, ok, start=user_start, user_id=user_id)
+
+    def _push_user(self, updator, user_id, *user_data):
+        """推送一个户号的数据，全部实体成功时才更新最近成功时间。"""
+        with self.report.span("ha_push", user_id=user_id):
+            results = updator.update_one_userid(user_id, *user_data)
+        failed = sum(1 for result in results if not result.ok)
+        skipped = sum(1 for result in results if result.skipped)
+        self.report.count("ha_entities_sent", len(results) - failed - skipped)
+        self.report.count("ha_entities_skipped", skipped)
+        HA_WRITES.labels("sent").inc(len(results) - failed - skipped)
+        HA_WRITES.labels("skipped").inc(skipped)
+        if failed:
+            self.report.count("ha_entities_failed", failed)
+        else:
+            LAST_SUCCESS.labels(user_id).set_to_current_time()
+        daily_records = self._daily_records.pop(user_id, None)
+        if self.statistics is not None and daily_records:
+            with self.report.span("statistics_import", user_id=user_id):
+                rows = self.statistics.import_records(user_id, daily_records)
+            self.report.count("statistics_rows", rows)
+
+    def _get_api_client(self, driver):
+        """接口模式：用已登录浏览器的状态构造接口客户端，失败返回 None（退回页面抓取）。"""
+        spec = load_spec()
+        if spec is None:
+            return None
+        try:
+            client = ApiClient.from_driver(spec, driver)
+            logging.info("已切换为接口模式获取数据。")
+            return client
+        except Exception as e:
+            logging.warning(f"构造接口客户端失败，改用页面抓取: {e}")
+            return None
 
+    @timed("get_current_userid")
     def _get_current_userid(self, driver):
         current_userid = driver.find_element(By.XPATH, '//*[@id="app"]/div/div/article/div/div/div[2]/div/div/div[1]/div[2]/div/div/div/div[2]/div/div[1]/div/ul/div/li[1]/span[2]').text
         return current_userid
     
+    @timed("choose_userid")
     def _choose_current_userid(self, driver, userid_index):
         elements = driver.find_elements(By.CLASS_NAME, "button_confirm")
         if elements:
             self._click_button(driver, By.XPATH, f'''//*[@id="app"]/div/div[2]/div/div/div/div[2]/div[2]/div/button''')
-        time.sleep(self.DETAIL_WAIT_TIME)
+        self.waiter.wait(driver, "userid_confirm", self.DETAIL_WAIT_TIME)
         self._click_button(driver, By.CLASS_NAME, "el-input__suffix")
-        time.sleep(self.DETAIL_WAIT_TIME)
+        self.waiter.wait(driver, "userid_dropdown", self.DETAIL_WAIT_TIME, _element_shown(By.XPATH, f"/html/body/div[2]/div[1]/div[1]/ul/li[{userid_index+1}]/span"))
         self._click_button(driver, By.XPATH, f"/html/body/div[2]/div[1]/div[1]/ul/li[{userid_index+1}]/span")
         
 
     def _get_all_data(self, driver, user_id, userid_index):
         balance = self._get_electric_balance(driver)
-        if (balance is None):
-            logging.info(f"获取户号 {user_id} 余额失败，跳过。")
-        else:
-            logging.info(
-                f"获取户号 {user_id} 余额成功，余额 {balance} 元。")
         self._dump_snapshot(driver, f"balance_{user_id}")
-        time.sleep(1)
+        self.waiter.wait(driver, "balance_loaded", 1)
         # swithc to electricity usage page
-        driver.get(ELECTRIC_USAGE_URL)
-        time.sleep(1)
+        self.page_timer.get(driver, ELECTRIC_USAGE_URL)
+        self.waiter.wait(driver, "usage_page", 1)
         self._choose_current_userid(driver, userid_index)
-        time.sleep(1)
+        self.waiter.wait(driver, "usage_userid", 1)
         # get data for each user id
         yearly_usage, yearly_charge = self._get_yearly_data(driver)
 
+        # 按月获取数据
+        logging.error(f"开始获取每月总用电")
+        month, month_usage, month_charge = self._get_month_usage(driver)
+        # 近30天日用电（含谷/平/峰/尖），增量模式下已入库的日期直接取库内数据
+        stored_tou = {}
+        if self.DAILY_INCREMENTAL and self.enable_database_storage:
+            stored_tou = self.load_stored_tou(user_id, DAILY_WINDOW_DAYS)
+            logging.info(f"户号 {user_id} 已入库 {len(stored_tou)} 天完整分时数据，这些日期不再展开。")
+        daily_records = self._get_daily_usage_data(driver, stored_tou)
+        return self._summarize_user_data(user_id, balance, yearly_usage, yearly_charge, month, month_usage, month_charge, daily_records)
+
+    @timed("get_all_data_from_api")
+    def _get_all_data_from_api(self, client, user_id):
+        """接口模式：直接调用 JSON 接口获取数据，后续处理与页面模式相同。"""
+        balance = client.get_balance(user_id)
+        yearly_usage, yearly_charge = client.get_yearly_data(user_id)
+        month, month_usage, month_charge = client.get_month_usage(user_id)
+        daily_records = client.get_daily_usage_data(user_id, days=DAILY_WINDOW_DAYS)
+        for record in daily_records:
+            logging.info(
+                f"日记录: 日期={record['date']}, 总={record['total']}, 谷={record['valley']}, 平={record['flat']}, 峰={record['peak']}, 尖={record['sharp']}"
+            )
+        return self._summarize_user_data(user_id, balance, yearly_usage, yearly_charge, month, month_usage, month_charge, daily_records)
+
+    def _summarize_user_data(self, user_id, balance, yearly_usage, yearly_charge, month, month_usage, month_charge, daily_records):
+        """由余额、年/月数据与日记录计算上报所需的各项数据，并按需写入数据库。"""
+        if (balance is None):
+            logging.info(f"获取户号 {user_id} 余额失败，跳过。")
+        else:
+            logging.info(
+                f"获取户号 {user_id} 余额成功，余额 {balance} 元。")
         if yearly_usage is None:
             logging.error(f"获取户号 {user_id} 年用电量失败，跳过。")
         else:
@@ -529,16 +930,11 @@ class DataFetcher:
             logging.info(
                 f"获取户号 {user_id} 年电费成功，费用 {yearly_charge} 元。")
 
-        # 按月获取数据
-        logging.error(f"开始获取每月总用电")
-        month, month_usage, month_charge = self._get_month_usage(driver)
         if month is None:
             logging.error(f"获取户号 {user_id} 月用电失败，跳过。")
         else:
             for m in range(len(month)):
                 logging.info(f"获取户号 {user_id} {month[m]} 数据成功，用电 {month_usage[m]} kWh，电费 {month_charge[m]} 元。")
-        # 近30天日用电（含谷/平/峰/尖）
-        daily_records = self._get_daily_usage_data(driver)
         last_daily_date = None
         last_daily_usage = None
         yesterday_tou = None
@@ -603,12 +999,15 @@ class DataFetcher:
                 }
                 break
 
+        self._daily_records[user_id] = daily_records
+
         # 新增储存用电量
         if self.enable_database_storage:
             logging.info("已启用数据库持久化，开始写入数据。")
             date = [r.get("date") for r in daily_records if r.get("date")]
             usages = [r.get("total") for r in daily_records if r.get("total") is not None]
-            self._save_user_data(user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage)
+            with self._db_lock:
+                self._save_user_data(user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage, daily_records)
         else:
             logging.info("未启用数据库持久化，跳过数据写入。")
 
@@ -623,26 +1022,28 @@ class DataFetcher:
 
         return balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, month_charge, month_usage, yesterday_tou, month_tou, first_day_history
 
+    @timed("get_user_ids")
     def _get_user_ids(self, driver):
         try:
             # 刷新网页
             driver.refresh()
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            self.waiter.wait(driver, "user_ids_refresh", self.RETRY_WAIT_TIME_OFFSET_UNIT, _element_shown(By.CLASS_NAME, "el-dropdown"))
             element = WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.presence_of_element_located((By.CLASS_NAME, 'el-dropdown')))
             # click roll down button for user id
             self._click_button(driver, By.XPATH, "//div[@class='el-dropdown']/span")
             logging.info(f"点击户号下拉按钮。")
-            time.sleep(3)
+            self.waiter.wait(driver, "user_ids_dropdown", 3, _element_shown(By.XPATH, "//ul[@class='el-dropdown-menu el-popper']/li"))
             # wait for roll down menu displayed
             target = driver.find_element(By.CLASS_NAME, "el-dropdown-menu.el-popper").find_element(By.TAG_NAME, "li")
             logging.info(f"获取下拉菜单首个选项。")
-            time.sleep(3)
+            self.waiter.wait(driver, "user_ids_menu", 3)
             WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(target))
-            time.sleep(0.1)
             logging.info(f"等待下拉菜单可见。")
             WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(
                 EC.text_to_be_present_in_element((By.XPATH, "//ul[@class='el-dropdown-menu el-popper']/li"), ":"))
-            time.sleep(0.1)
+            # 等所有户号选项都渲染出文本
+            self.waiter.wait(driver, "user_ids_text", 1, lambda d: all(
+                ":" in li.text for li in d.find_elements(By.XPATH, "//ul[@class='el-dropdown-menu el-popper']/li")))
 
             # get user id one by one
             userid_elements = driver.find_element(By.CLASS_NAME, "el-dropdown-menu.el-popper").find_elements(By.TAG_NAME, "li")
@@ -653,8 +1054,10 @@ class DataFetcher:
         except Exception as e:
             logging.error(
                 f"浏览器异常退出，获取户号列表失败，原因: {e}。")
-            driver.quit()
+            # 浏览器由 _fetch 统一归还（出错时丢弃），这里只向上抛出
+            raise
 
+    @timed("get_balance")
     def _get_electric_balance(self, driver):
         try:
             balance = driver.find_element(By.CLASS_NAME, "num").text
@@ -666,17 +1069,18 @@ class DataFetcher:
         except:
             return None
 
+    @timed("get_yearly_data")
     def _get_yearly_data(self, driver):
 
         try:
             if datetime.now().month == 1:
                 self._click_button(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                self.waiter.wait(driver, "yearly_picker", self.RETRY_WAIT_TIME_OFFSET_UNIT)
                 span_element = driver.find_element(By.XPATH, f"//span[contains(text(), '{datetime.now().year - 1}')]")
                 span_element.click()
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                self.waiter.wait(driver, "yearly_year", self.RETRY_WAIT_TIME_OFFSET_UNIT)
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            self.waiter.wait(driver, "yearly_tab", self.RETRY_WAIT_TIME_OFFSET_UNIT, _element_shown(By.CLASS_NAME, "total"))
             # wait for data displayed
             target = driver.find_element(By.CLASS_NAME, "total")
             WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(target))
@@ -704,7 +1108,7 @@ class DataFetcher:
         try:
             # 点击日用电量
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            self.waiter.wait(driver, "yesterday_tab", self.RETRY_WAIT_TIME_OFFSET_UNIT)
             # wait for data displayed
             usage_element = driver.find_element(By.XPATH,
                                                 "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[2]/div")
@@ -719,18 +1123,19 @@ class DataFetcher:
             logging.error(f"昨日数据获取失败: {e}")
             return None
 
+    @timed("get_month_usage")
     def _get_month_usage(self, driver):
         """获取每月用电量"""
 
         try:
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.DETAIL_WAIT_TIME)
+            self.waiter.wait(driver, "month_tab", self.DETAIL_WAIT_TIME)
             if datetime.now().month == 1:
                 self._click_button(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.DETAIL_WAIT_TIME)
+                self.waiter.wait(driver, "month_picker", self.DETAIL_WAIT_TIME)
                 span_element = driver.find_element(By.XPATH, f"//span[contains(text(), '{datetime.now().year - 1}')]")
                 span_element.click()
-                time.sleep(self.DETAIL_WAIT_TIME)
+                self.waiter.wait(driver, "month_year", self.DETAIL_WAIT_TIME)
             # wait for month displayed
             target = driver.find_element(By.CLASS_NAME, "total")
             WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(target))
@@ -752,11 +1157,14 @@ class DataFetcher:
             return None,None,None
 
     # 获取近30天每日用电量及分时段（谷/平/峰/尖）
-    def _get_daily_usage_data(self, driver):
+    @timed("get_daily_usage")
+    def _get_daily_usage_data(self, driver, stored_tou=None):
+        """:param stored_tou: {日期: 记录}，这些日期跳过展开，直接使用库内的谷/平/峰/尖"""
+        stored_tou = stored_tou or {}
         records = []
         logging.info("切换到日用电(近30天)标签。")
         self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-        time.sleep(self.DETAIL_WAIT_TIME)
+        self.waiter.wait(driver, "daily_tab", self.DETAIL_WAIT_TIME)
 
         # 强制切到近30天
         try:
@@ -764,182 +1172,257 @@ class DataFetcher:
         except Exception:
             # 兼容只有一个选项的情况
             self._click_button(driver, By.XPATH, "//*[@id='pane-second']/div[1]/div/label[1]/span[1]")
-        time.sleep(self.DETAIL_WAIT_TIME)
+        self.waiter.wait(driver, "daily_range", self.DETAIL_WAIT_TIME)
         logging.info("日用电标签就绪，等待数据行出现。")
 
         # 页面上方是折线图，真实表格在下方，需要滚动到表格区域再等待行出现
         try:
             chart_anchor = driver.find_element(By.XPATH, "//div[@class='el-tab-pane dayd']//div[contains(@class,'echarts')]//canvas | //div[@class='el-tab-pane dayd']//div[contains(@class,'chart')]")
             driver.execute_script("arguments[0].scrollIntoView({block: 'end'});", chart_anchor)
-            time.sleep(0.2)
+            self.waiter.wait(driver, "daily_scroll", 0.2)
             driver.execute_script("window.scrollBy(0, 600);")
         except Exception:
             # 即便找不到锚点也继续，让后续等待去兜底
             driver.execute_script("window.scrollBy(0, 800);")
-            time.sleep(0.2)
+            self.waiter.wait(driver, "daily_scroll", 0.2)
 
         # 等待第一行出现（表格在下方，需滚动后再等）
         first_row = WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(
-            EC.presence_of_element_located((By.XPATH, "//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and not(contains(@class,'el-table__expanded-row'))]"))
+            EC.presence_of_element_located((By.XPATH, DAILY_ROWS_XPATH))
         )
         WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(first_row))
 
         rows = driver.find_elements(
             By.XPATH,
-            "//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and not(contains(@class,'el-table__expanded-row'))]",
+            DAILY_ROWS_XPATH,
         )
         if not rows:
-            self._dump_snapshot(driver, "daily_table_not_found_after_scroll")
+            self._dump_snapshot(driver, "daily_table_not_found_after_scroll", error=True)
             logging.debug("未找到日数据行，已截图 daily_table_not_found_after_scroll。")
         logging.info(f"检测到 {len(rows)} 条日数据，开始解析。")
 
-        for row in rows:
-            row_start = time.perf_counter()
-            try:
-                day_text = row.find_element(By.XPATH, "td[1]/div").text
-                total_text = row.find_element(By.XPATH, "td[2]/div").text
-                total = float(total_text) if total_text else None
-            except Exception as e:
-                logging.debug(f"因解析错误跳过一行日数据: {e}")
-                continue
+        bulk_items = self._bulk_extract_daily_rows(driver, list(stored_tou)) if self.DAILY_BULK_EXTRACT and rows else None
+        if bulk_items is not None and len(bulk_items) != len(rows):
+            logging.warning(f"批量解析返回 {len(bulk_items)} 行，与表格 {len(rows)} 行不一致，改为逐行解析。")
+            bulk_items = None
 
-            valley = flat = peak = sharp = None
-            took_detail_snapshot = False
-            # 展开当日详情获取谷/平/峰/尖（需点击行最右侧的箭头按钮）
-            try:
-                expand_btn = row.find_element(
-                    By.XPATH,
-                    "(.//button[contains(@class,'el-table__expand-icon')] | .//span[contains(@class,'el-table__expand-icon')] | .//div[contains(@class,'el-table__expand-icon')] | .//td[last()]//*[contains(@class,'arrow') or contains(@class,'caret') or contains(@class,'el-icon')])[1]",
-                )
-            except Exception:
-                expand_btn = None
-
-            if not expand_btn:
-                # 无展开按钮也截个图方便排查 DOM 结构
-                if not took_detail_snapshot:
-                    self._dump_snapshot(driver, f"daily_detail_{day_text}_no_expand_btn")
-                    took_detail_snapshot = True
-                logging.debug(f"未找到 {day_text} 的展开按钮，跳过谷/平/峰/尖解析。")
+        for index, row in enumerate(rows):
+            if bulk_items is not None and bulk_items[index]["skipped"]:
+                record = self._daily_record_from_store(stored_tou[bulk_items[index]["date"]], bulk_items[index]["total"])
+            elif bulk_items is not None and bulk_items[index]["expanded"]:
+                record = self._daily_record_from_bulk(bulk_items[index])
             else:
-                for attempt in range(2):
-                    try:
-                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", expand_btn)
-                        time.sleep(0.5)
+                # 批量模式关闭、失败或该行未能完整解析时逐行处理，批量脚本已点开的行不再点击
+                already_clicked = bulk_items is not None and bulk_items[index]["clicked"]
+                record = self._parse_daily_row(driver, row, stored_tou, already_clicked=already_clicked)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _bulk_extract_daily_rows(self, driver, skip_dates=()):
+        """一次 execute_async_script 展开全部日数据行并取回所有字段，失败返回 None。"""
+        start = time.perf_counter()
+        timeout = max(self.DETAIL_WAIT_TIME, 5)
+        previous_timeout = None
+        try:
+            previous_timeout = driver.timeouts.script
+            driver.set_script_timeout(timeout + 10)
+            items = driver.execute_async_script(
+                DAILY_BULK_EXTRACT_JS, DAILY_ROWS_XPATH, DAILY_EXPAND_BTN_XPATH, timeout * 1000, list(skip_dates))
+        except Exception as e:
+            logging.warning(f"批量解析日数据失败，改为逐行解析: {e}")
+            self._dump_snapshot(driver, "daily_bulk_extract_failed", error=True)
+            return None
+        finally:
+            # 恢复原脚本超时，避免影响同一浏览器后续的异步脚本
+            if previous_timeout is not None:
+                try:
+                    driver.set_script_timeout(previous_timeout)
+                except Exception as e:
+                    logging.debug(f"恢复脚本超时失败: {e}")
+        logging.info(f"批量解析 {len(items)} 条日数据，耗时={time.perf_counter() - start:.2f}s")
+        return items
+
+    def _daily_record_from_bulk(self, item):
+        try:
+            total = float(item["total"]) if item["total"] else None
+        except Exception as e:
+            logging.debug(f"因解析错误跳过一行日数据: {e}")
+            return None
+        values = {}
+        for key in ("valley", "flat", "peak", "sharp"):
+            values[key] = float(item[key]) if item[key] is not None else None
+        record = {"date": item["date"], "total": total, **values}
+        logging.info(
+            f"日记录: 日期={record['date']}, 总={total}, 谷={values['valley']}, 平={values['flat']}, 峰={values['peak']}, 尖={values['sharp']}"
+        )
+        return record
+
+    def _daily_record_from_store(self, stored, total_text):
+        """页面上的总用电为准，谷/平/峰/尖取自数据库。"""
+        try:
+            total = float(total_text) if total_text else stored["total"]
+        except ValueError:
+            total = stored["total"]
+        record = {**stored, "total": total}
+        logging.info(
+            f"日记录(库内): 日期={record['date']}, 总={total}, 谷={record['valley']}, 平={record['flat']}, 峰={record['peak']}, 尖={record['sharp']}"
+        )
+        return record
+
+    def _parse_daily_row(self, driver, row, stored_tou=None, already_clicked=False):
+        """逐行解析一条日数据：读取日期与总用电，展开详情获取谷/平/峰/尖，解析失败返回 None。
+
+        :param already_clicked: 该行已被批量脚本点开，首次尝试不再点击展开按钮
+        """
+        row_start = time.perf_counter()
+        try:
+            day_text = row.find_element(By.XPATH, "td[1]/div").text
+            total_text = row.find_element(By.XPATH, "td[2]/div").text
+            total = float(total_text) if total_text else None
+        except Exception as e:
+            logging.debug(f"因解析错误跳过一行日数据: {e}")
+            return None
+        if stored_tou and day_text in stored_tou:
+            return self._daily_record_from_store(stored_tou[day_text], total_text)
+
+        valley = flat = peak = sharp = None
+        took_detail_snapshot = False
+        # 展开当日详情获取谷/平/峰/尖（需点击行最右侧的箭头按钮）
+        try:
+            expand_btn = row.find_element(
+                By.XPATH,
+                DAILY_EXPAND_BTN_XPATH,
+            )
+        except Exception:
+            expand_btn = None
+
+        if not expand_btn:
+            # 无展开按钮也截个图方便排查 DOM 结构
+            if not took_detail_snapshot:
+                self._dump_snapshot(driver, f"daily_detail_{day_text}_no_expand_btn", error=True)
+                took_detail_snapshot = True
+            logging.debug(f"未找到 {day_text} 的展开按钮，跳过谷/平/峰/尖解析。")
+        else:
+            for attempt in range(2):
+                try:
+                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", expand_btn)
+                    self.waiter.wait(driver, "daily_row_scroll", 0.5)
+                    if not (already_clicked and attempt == 0):
                         try:
                             WebDriverWait(driver, self.DETAIL_WAIT_TIME).until(EC.element_to_be_clickable(expand_btn))
                             expand_btn.click()
                         except Exception:
                             driver.execute_script("arguments[0].click();", expand_btn)
 
-                        if not took_detail_snapshot:
-                            self._dump_snapshot(driver, f"daily_detail_{day_text}_attempt{attempt+1}")
-                            took_detail_snapshot = True
+                    if not took_detail_snapshot:
+                        self._dump_snapshot(driver, f"daily_detail_{day_text}_attempt{attempt+1}")
+                        took_detail_snapshot = True
 
-                        # 使用日期重新定位行以避免展开后原行失效
-                        try:
-                            WebDriverWait(driver, max(self.DETAIL_WAIT_TIME, 5)).until(
-                                lambda d: len(
-                                    d.find_elements(
-                                        By.XPATH,
-                                        f"//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and .//td[1]/div[text()='{day_text}']]//following-sibling::tr[1]/td[contains(@class,'el-table__expanded-cell')]",
-                                    )
+                    # 使用日期重新定位行以避免展开后原行失效
+                    try:
+                        WebDriverWait(driver, max(self.DETAIL_WAIT_TIME, 5)).until(
+                            lambda d: len(
+                                d.find_elements(
+                                    By.XPATH,
+                                    f"//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and .//td[1]/div[text()='{day_text}']]//following-sibling::tr[1]/td[contains(@class,'el-table__expanded-cell')]",
                                 )
-                                > 0
                             )
-                        except Exception:
-                            logging.info(f"3-e")
-                            continue
-
-                        try:
-                            driver.implicitly_wait(0)
-                            detail_rows = driver.find_elements(
-                                By.XPATH,
-                                f"//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and .//td[1]/div[text()='{day_text}']]//following-sibling::tr[1]/td[contains(@class,'el-table__expanded-cell')]",
-                            )
-                        finally:
-                            driver.implicitly_wait(self.DRIVER_IMPLICITY_WAIT_TIME)
+                            > 0
+                        )
+                    except Exception:
+                        logging.info(f"3-e")
+                        continue
 
-                        if not detail_rows:
-                            if attempt == 1:
-                                self._dump_snapshot(driver, f"daily_detail_{day_text}_no_detail_rows")
-                            continue
+                    try:
+                        driver.implicitly_wait(0)
+                        detail_rows = driver.find_elements(
+                            By.XPATH,
+                            f"//div[@class='el-tab-pane dayd']//table/tbody/tr[contains(@class,'el-table__row') and .//td[1]/div[text()='{day_text}']]//following-sibling::tr[1]/td[contains(@class,'el-table__expanded-cell')]",
+                        )
+                    finally:
+                        driver.implicitly_wait(self.DRIVER_IMPLICITY_WAIT_TIME)
+
+                    if not detail_rows:
+                        if attempt == 1:
+                            self._dump_snapshot(driver, f"daily_detail_{day_text}_no_detail_rows", error=True)
+                        continue
 
-                        detail_cell = detail_rows[0]
-                        try:
-                            WebDriverWait(driver, self.DETAIL_WAIT_TIME).until(
-                                EC.presence_of_element_located(
-                                    (
-                                        By.XPATH,
-                                        ".//div[contains(@class,'drop-box')]/div[contains(@class,'drop-box-left')]//p",
-                                    )
+                    detail_cell = detail_rows[0]
+                    try:
+                        WebDriverWait(driver, self.DETAIL_WAIT_TIME).until(
+                            EC.presence_of_element_located(
+                                (
+                                    By.XPATH,
+                                    ".//div[contains(@class,'drop-box')]/div[contains(@class,'drop-box-left')]//p",
                                 )
                             )
-                        except Exception:
-                            # 即便没等到也继续尝试解析
-                            pass
-
-                        def _extract_from_paragraph(label: str):
-                            elems = detail_cell.find_elements(
-                                By.XPATH,
-                                f".//div[contains(@class,'drop-box-left')]//p[.//*[contains(text(), '{label}')]]//span[contains(@class,'num')]")
-                            for elem in elems:
+                        )
+                    except Exception:
+                        # 即便没等到也继续尝试解析
+                        pass
+
+                    def _extract_from_paragraph(label: str):
+                        elems = detail_cell.find_elements(
+                            By.XPATH,
+                            f".//div[contains(@class,'drop-box-left')]//p[.//*[contains(text(), '{label}')]]//span[contains(@class,'num')]")
+                        for elem in elems:
+                            m = re.search(r"([0-9]+\.?[0-9]*)", elem.text)
+                            if m:
+                                return float(m.group(1))
+                        return None
+
+                    valley = valley if valley is not None else _extract_from_paragraph("谷")
+                    flat = flat if flat is not None else _extract_from_paragraph("平")
+                    peak = peak if peak is not None else _extract_from_paragraph("峰")
+                    sharp = sharp if sharp is not None else _extract_from_paragraph("尖")
+
+                    # 兜底：在整块里模糊匹配关键词 + 数字
+                    def _extract_by_keyword(keyword: str):
+                        xpath_candidates = [
+                            f".//*[contains(text(), '{keyword}')]",
+                            f".//span[contains(text(), '{keyword}')]",
+                            f".//div[contains(text(), '{keyword}')]",
+                        ]
+                        for xp in xpath_candidates:
+                            for elem in detail_cell.find_elements(By.XPATH, xp):
                                 m = re.search(r"([0-9]+\.?[0-9]*)", elem.text)
                                 if m:
                                     return float(m.group(1))
-                            return None
-
-                        valley = valley if valley is not None else _extract_from_paragraph("谷")
-                        flat = flat if flat is not None else _extract_from_paragraph("平")
-                        peak = peak if peak is not None else _extract_from_paragraph("峰")
-                        sharp = sharp if sharp is not None else _extract_from_paragraph("尖")
-
-                        # 兜底：在整块里模糊匹配关键词 + 数字
-                        def _extract_by_keyword(keyword: str):
-                            xpath_candidates = [
-                                f".//*[contains(text(), '{keyword}')]",
-                                f".//span[contains(text(), '{keyword}')]",
-                                f".//div[contains(text(), '{keyword}')]",
-                            ]
-                            for xp in xpath_candidates:
-                                for elem in detail_cell.find_elements(By.XPATH, xp):
-                                    m = re.search(r"([0-9]+\.?[0-9]*)", elem.text)
-                                    if m:
-                                        return float(m.group(1))
-                            return None
-
-                        valley = valley if valley is not None else _extract_by_keyword("谷用电")
-                        flat = flat if flat is not None else _extract_by_keyword("平用电")
-                        peak = peak if peak is not None else _extract_by_keyword("峰用电")
-                        sharp = sharp if sharp is not None else _extract_by_keyword("尖用电")
-                        break
-                    except Exception as inner_e:
-                        logging.debug(f"展开 {day_text} 尝试 {attempt+1} 失败: {inner_e}")
-                        if attempt == 1:
-                            if not took_detail_snapshot:
-                                self._dump_snapshot(driver, f"daily_detail_{day_text}_expand_failed")
-                            raise
-                        time.sleep(1)
-                else:
-                    if not took_detail_snapshot:
-                        self._dump_snapshot(driver, f"daily_detail_{day_text}_expand_unresolved")
-                        took_detail_snapshot = True
+                        return None
+
+                    valley = valley if valley is not None else _extract_by_keyword("谷用电")
+                    flat = flat if flat is not None else _extract_by_keyword("平用电")
+                    peak = peak if peak is not None else _extract_by_keyword("峰用电")
+                    sharp = sharp if sharp is not None else _extract_by_keyword("尖用电")
+                    break
+                except Exception as inner_e:
+                    logging.debug(f"展开 {day_text} 尝试 {attempt+1} 失败: {inner_e}")
+                    if attempt == 1:
+                        if not took_detail_snapshot:
+                            self._dump_snapshot(driver, f"daily_detail_{day_text}_expand_failed", error=True)
+                        raise
+                    time.sleep(1)
+            else:
+                if not took_detail_snapshot:
+                    self._dump_snapshot(driver, f"daily_detail_{day_text}_expand_unresolved", error=True)
+                    took_detail_snapshot = True
 
-            record = {
-                "date": day_text,
-                "total": total,
-                "valley": valley,
-                "flat": flat,
-                "peak": peak,
-                "sharp": sharp,
-            }
-            duration = time.perf_counter() - row_start
-            logging.info(
-                f"日记录: 日期={day_text}, 总={total}, 谷={valley}, 平={flat}, 峰={peak}, 尖={sharp}, 耗时={duration:.2f}s"
-            )
-            records.append(record)
-        return records
+        record = {
+            "date": day_text,
+            "total": total,
+            "valley": valley,
+            "flat": flat,
+            "peak": peak,
+            "sharp": sharp,
+        }
+        duration = time.perf_counter() - row_start
+        logging.info(
+            f"日记录: 日期={day_text}, 总={total}, 谷={valley}, 平={flat}, 峰={peak}, 尖={sharp}, 耗时={duration:.2f}s"
+        )
+        return record
 
-    def _save_user_data(self, user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage):
+    def _save_user_data(self, user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage, daily_records=None):
         # 连接数据库集合
         if self.connect_user_db(user_id):
             # 写入当前户号
@@ -971,6 +1454,11 @@ class DataFetcher:
                 except Exception as e:
                     logging.debug(f"写入 {date[index]} 用电失败，可能已存在: {str(e)}")
 
+            # 写入每日分时数据
+            for record in daily_records or []:
+                if record.get("date"):
+                    self.insert_tou_data(record)
+
             for index in range(len(month)):
                 try:
                     dic = {'name': f"{month[index]}usage", 'value': f"{month_usage[index]}"}
@@ -0,0 +1,199 @@
+"""
+A small pool of warm WebDriver instances kept alive between scheduled runs,
+so each fetch does not pay the Firefox/geckodriver cold start.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+
+def process_tree_rss_mb(pid):
+    """进程及其直接子进程（Firefox 内容进程）的常驻内存，单位 MB；读取失败返回 0。"""
+    total_kb = 0
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+def driver_rss_mb(driver):
+    """浏览器进程树的常驻内存，无法获取进程号时返回 0。"""
+    pid = driver.capabilities.get("moz:processID")
+    if not pid:
+        return 0
+    return process_tree_rss_mb(pid)
+
+
+class _PooledDriver:
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class DriverPool:
+
+    def __init__(self, factory, size=1, max_uses=10, max_rss_mb=1024, acquire_timeout=600):
+        """
+        :param factory: 创建新 WebDriver 的无参函数
+        :param size: 最多同时存在的浏览器实例数
+        :param max_uses: 单个实例使用多少次后回收重建
+        :param max_rss_mb: 实例内存超过该值（MB）时回收重建，0 表示不限制
+        :param acquire_timeout: acquire 默认最长等待秒数，名额泄漏时报错而不是永久阻塞
+        """
+        self._factory = factory
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._in_use = {}
+        self._creating = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls, factory):
+        """根据 BROWSER_POOL_SIZE 等环境变量创建，BROWSER_POOL_SIZE 为 0 时返回 None（不使用浏览器池）。"""
+        size = int(os.getenv("BROWSER_POOL_SIZE", 0))
+        if size <= 0:
+            return None
+        return cls(
+            factory,
+            size=size,
+            max_uses=int(os.getenv("BROWSER_MAX_USES", 10)),
+            max_rss_mb=int(os.getenv("BROWSER_MAX_RSS_MB", 1024)),
+            acquire_timeout=int(os.getenv("BROWSER_ACQUIRE_TIMEOUT_SECONDS", 600)),
+        )
+
+    def start(self):
+        """预先启动全部实例。"""
+        for _ in range(self.size):
+            driver = self._create()
+            if driver is None:
+                break
+            with self._cond:
+                self._idle.append(_PooledDriver(driver))
+                self._cond.notify()
+        logging.info(f"浏览器池已预热 {len(self._idle)} 个实例。")
+
+    def acquire(self, timeout=None):
+        """取出一个健康的浏览器实例，池满且都在使用时等待归还，最多等待 timeout（默认 acquire_timeout）秒。"""
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭。")
+                while not self._idle and len(self._in_use) + self._creating >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise TimeoutError(f"等待可用浏览器超时，{len(self._in_use)} 个实例仍被占用。")
+                if self._idle:
+                    entry = self._idle.popleft()
+                else:
+                    entry = None
+                    self._creating += 1
+
+            if entry is None:
+                try:
+                    driver = self._factory()
+                finally:
+                    with self._cond:
+                        self._creating -= 1
+                entry = _PooledDriver(driver)
+            elif not self._is_healthy(entry.driver):
+                logging.info("浏览器实例健康检查失败，重新创建。")
+                self._quit(entry.driver)
+                with self._cond:
+                    self._cond.notify()
+                continue
+
+            entry.uses += 1
+            with self._cond:
+                self._in_use[id(entry.driver)] = entry
+            return entry.driver
+
+    def release(self, driver, discard=False):
+        """归还实例；使用次数或内存超限、或 discard=True 时直接回收。"""
+        with self._cond:
+            entry = self._in_use.pop(id(driver), None)
+        if entry is None:
+            return
+        if not discard and not self._closed:
+            if entry.uses >= self.max_uses:
+                logging.info(f"浏览器实例已使用 {entry.uses} 次，回收重建。")
+                discard = True
+            elif self.max_rss_mb and driver_rss_mb(driver) > self.max_rss_mb:
+                logging.info(f"浏览器实例内存超过 {self.max_rss_mb} MB，回收重建。")
+                discard = True
+        if not discard and not self._reset(driver):
+            discard = True
+
+        if discard or self._closed:
+            self._quit(driver)
+        else:
+            with self._cond:
+                self._idle.append(entry)
+        with self._cond:
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            entries = list(self._idle) + list(self._in_use.values())
+            self._idle.clear()
+            self._in_use.clear()
+            self._cond.notify_all()
+        for entry in entries:
+            self._quit(entry.driver)
+        logging.info("浏览器池已关闭。")
+
+    def _create(self):
+        try:
+            return self._factory()
+        except Exception as e:
+            logging.error(f"浏览器池创建实例失败: {e}")
+            return None
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+
+    def _reset(self, driver):
+        """清掉登录态与多余窗口，避免带到下一次任务或其他账号。"""
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.delete_all_cookies()
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logging.debug(f"重置浏览器实例失败: {e}")
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"关闭浏览器实例失败: {e}")
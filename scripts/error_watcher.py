@@ -5,6 +5,7 @@ This script provides a wrapper to save screenshots of errors.
 import os
 import logging
 import functools
+import threading
 from datetime import datetime
 from typing import Callable, Optional
 
@@ -58,9 +59,14 @@ class ErrorWatcher:
 
     def set_driver(self, driver):
         """
-        Set the driver for taking screenshots.
+        Set the driver for taking screenshots in the current thread.
+        Accounts run concurrently in their own threads, each with its own browser.
         """
-        self.driver = driver
+        self._local.driver = driver
+
+    @property
+    def driver(self):
+        return getattr(self._local, 'driver', None) or self._default_driver
     
     def watch_this(self, func, **options):
         """
@@ -83,7 +89,8 @@ class ErrorWatcher:
         self.screenshot_dir = kwargs.get('screenshot_dir', os.path.join(self.root_dir, 'screenshots'))
         if not os.path.exists(self.screenshot_dir):
             os.makedirs(self.screenshot_dir)
-        self.driver = kwargs.get('driver', None)
+        self._default_driver = kwargs.get('driver', None)
+        self._local = threading.local()
 
     _instance = None
 
@@ -109,7 +116,7 @@ class ErrorWatcher:
         screenshot_path = os.path.join(self.screenshot_dir, f'error_{timestamp}.png')
         
         try:
-            self.driver.save_screenshot(screenshot_path)
+            driver.save_screenshot(screenshot_path)
             logging.error(f"捕获异常: {error_message}，截图已保存到 {screenshot_path}")
         except Exception as e:
             logging.error(f"保存截图失败: {e}")
@@ -0,0 +1,175 @@
+"""
+Adaptive scheduling driven by data freshness. Every run records the newest daily date it saw
+per account; from that history we estimate when SGCC usually publishes a new day, probe
+close to that time, re-probe at an interval while the data is stale and stop for the day
+once a new day has appeared.
+
+Each account has at most one pending probe job. Runs finish on worker threads, which only
+queue the next plan() for the scheduler thread, where the job is replaced.
+"""
+
+import logging
+import sqlite3
+import statistics
+import threading
+from datetime import datetime, timedelta
+
+import schedule
+
+import scheduler
+
+
+class FreshnessStore:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        connect = sqlite3.connect(self.path)
+        try:
+            connect.execute('''CREATE TABLE IF NOT EXISTS fetch_freshness (
+                    account TEXT NOT NULL,
+                    run_at TEXT NOT NULL,
+                    last_daily_date TEXT)''')
+            connect.commit()
+        finally:
+            connect.close()
+
+    def record(self, account, run_at, last_daily_date):
+        with self._lock:
+            connect = sqlite3.connect(self.path)
+            try:
+                connect.execute("INSERT INTO fetch_freshness VALUES(?,?,?);",
+                                (account, run_at.strftime("%Y-%m-%d %H:%M:%S"), last_daily_date))
+                connect.commit()
+            finally:
+                connect.close()
+
+    def runs_since(self, account, since):
+        """返回 since 之后的 [(运行时间, 最新日期)]，按时间排序。"""
+        connect = sqlite3.connect(self.path)
+        try:
+            rows = connect.execute(
+                "SELECT run_at, last_daily_date FROM fetch_freshness WHERE account = ? AND run_at >= ? ORDER BY run_at;",
+                (account, since.strftime("%Y-%m-%d %H:%M:%S"))).fetchall()
+        finally:
+            connect.close()
+        return [(datetime.strptime(run_at, "%Y-%m-%d %H:%M:%S"), date) for run_at, date in rows]
+
+
+def _latest(dates):
+    dates = [d for d in dates if d]
+    return max(dates) if dates else None
+
+
+def split_by_day(runs):
+    """按运行日期分组，并给出每天开始前已见过的最新日期。"""
+    days = {}
+    seen = None
+    for run_at, date in runs:
+        day = days.setdefault(run_at.date(), {"before": seen, "runs": []})
+        day["runs"].append((run_at, date))
+        seen = _latest([seen, date])
+    return days
+
+
+def first_fresh(day):
+    """当天第一次看到新日期的运行时间，以及此前最后一次仍是旧数据的运行时间。"""
+    last_stale = None
+    for run_at, date in day["runs"]:
+        if date and (day["before"] is None or date > day["before"]):
+            return last_stale, run_at
+        if date:
+            last_stale = run_at
+    return last_stale, None
+
+
+def estimate_publish_minutes(runs, probe_interval):
+    """
+    估计新数据通常在一天中的第几分钟出现：有“旧→新”区间的取区间中点，
+    第一次探测即为新数据的取探测时间前半个间隔（逐日向前试探），多天取中位数。
+    """
+    estimates = []
+    for day in split_by_day(runs).values():
+        if day["before"] is None:
+            continue
+        last_stale, fresh_at = first_fresh(day)
+        if fresh_at is None:
+            continue
+        minutes = fresh_at.hour * 60 + fresh_at.minute
+        if last_stale is not None:
+            minutes = (minutes + last_stale.hour * 60 + last_stale.minute) / 2
+        else:
+            minutes = max(0, minutes - probe_interval / 2)
+        estimates.append(minutes)
+    return statistics.median(estimates) if estimates else None
+
+
+class AdaptiveSchedule:
+
+    def __init__(self, store, fetcher, submit, default_time, probe_interval=60, max_probes=6, history_days=14, margin=10):
+        """
+        :param submit: 提交任务的函数 submit(fetcher, callback)，返回是否已提交
+        :param default_time: 没有历史数据时的首次探测时间（datetime，只用时分）
+        :param probe_interval: 数据未更新时的再次探测间隔（分钟）
+        :param max_probes: 每天最多探测次数
+        :param history_days: 用于估计的历史天数
+        :param margin: 首次探测比估计时间晚多少分钟
+        """
+        self.store = store
+        self.fetcher = fetcher
+        self.submit = submit
+        self.default_minutes = default_time.hour * 60 + default_time.minute
+        self.probe_interval = probe_interval
+        self.max_probes = max_probes
+        self.history_days = history_days
+        self.margin = margin
+        self.account = fetcher._username
+        # 当前排队中的探测任务，重新安排时先取消
+        self._job = None
+
+    def first_probe_minutes(self, now):
+        since = datetime.combine(now.date() - timedelta(days=self.history_days), datetime.min.time())
+        estimate = estimate_publish_minutes(self.store.runs_since(self.account, since), self.probe_interval)
+        if estimate is None:
+            return self.default_minutes
+        return min(estimate + self.margin, 24 * 60 - 1)
+
+    def next_probe(self, now):
+        """计算下一次探测时间：当天已看到新数据或探测次数用完则改到次日。"""
+        since = datetime.combine(now.date() - timedelta(days=self.history_days), datetime.min.time())
+        days = split_by_day(self.store.runs_since(self.account, since))
+        today = days.get(now.date())
+        first_probe = datetime.combine(now.date(), datetime.min.time()) + timedelta(minutes=self.first_probe_minutes(now))
+        if today is None:
+            return max(first_probe, now)
+        if first_fresh(today)[1] is not None or len(today["runs"]) >= self.max_probes:
+            tomorrow = now + timedelta(days=1)
+            return datetime.combine(tomorrow.date(), datetime.min.time()) + timedelta(minutes=self.first_probe_minutes(tomorrow))
+        last_run = today["runs"][-1][0]
+        return max(first_probe, last_run + timedelta(minutes=self.probe_interval), now)
+
+    def plan(self):
+        """安排下一次探测并取消此前的探测任务，只能在调度线程调用。"""
+        now = datetime.now()
+        due = self.next_probe(now)
+        delay = max(1, int((due - now).total_seconds()))
+        if self._job is not None:
+            schedule.cancel_job(self._job)
+        self._job = schedule.every(delay).seconds.do(self._due)
+        logging.info(f"账号 {self.account} 下一次探测时间: {due.strftime('%Y-%m-%d %H:%M')}。")
+
+    def run_now(self):
+        if not self.submit(self.fetcher, self.after_run):
+            self.plan()
+
+    def _due(self):
+        self._job = None
+        self.run_now()
+        return schedule.CancelJob
+
+    def after_run(self):
+        """任务结束后（工作线程中）记录看到的最新日期，交由调度线程安排下一次探测。"""
+        last_daily_date = _latest(self.fetcher.last_daily_dates.values())
+        self.store.record(self.account, datetime.now(), last_daily_date)
+        logging.info(f"账号 {self.account} 本次最新日数据日期: {last_daily_date}。")
+        scheduler.call_soon(self.plan)
@@ -0,0 +1,106 @@
+"""
+REST transport for Home Assistant state pushes. One keep-alive requests.Session is shared
+by every account, each request has a timeout, and the entities of one household are posted
+concurrently through a small bounded thread pool. Every push returns a PushResult so the
+caller can see which entities failed instead of only finding them in the log.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from const import API_PATH
+from metrics import HA_REQUEST_DURATION, HA_REQUESTS
+
+
+def create_client():
+    """按 HA_TRANSPORT 创建客户端：rest（默认）或 websocket。"""
+    if os.getenv("HA_TRANSPORT", "rest").lower() == "websocket":
+        from ha_websocket import HAWebSocketClient
+        return HAWebSocketClient.from_env()
+    return HAClient.from_env()
+
+
+class PushResult:
+    """一个实体的推送结果，status 为 HTTP 状态码，请求未完成时为 None；skipped 表示未变化而未推送。"""
+
+    __slots__ = ("entity_id", "ok", "status", "error", "duration", "skipped")
+
+    def __init__(self, entity_id, ok, status=None, error=None, duration=0.0, skipped=False):
+        self.entity_id = entity_id
+        self.ok = ok
+        self.status = status
+        self.error = error
+        self.duration = duration
+        self.skipped = skipped
+
+    def __repr__(self):
+        return f"PushResult({self.entity_id}, ok={self.ok}, status={self.status}, error={self.error}, skipped={self.skipped})"
+
+
+class HAClient:
+
+    def __init__(self, base_url, token, timeout=10, workers=4):
+        """
+        :param timeout: 单个请求的连接/读取超时（秒）
+        :param workers: 同时推送的实体数，也是连接池大小
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.workers = max(1, workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": "Bearer " + token,
+        })
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ha")
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.getenv("HASS_URL", ""),
+            os.getenv("HASS_TOKEN", ""),
+            timeout=float(os.getenv("HA_TIMEOUT_SECONDS", 10)),
+            workers=int(os.getenv("HA_PUSH_WORKERS", 4)),
+        )
+
+    def post_state(self, entity_id, body):
+        url = self.base_url + API_PATH + entity_id  # /api/states/<entity_id>
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, json=body, timeout=self.timeout)
+        except requests.RequestException as e:
+            HA_REQUESTS.labels("error").inc()
+            return PushResult(entity_id, False, error=str(e), duration=time.perf_counter() - start)
+        finally:
+            HA_REQUEST_DURATION.observe(time.perf_counter() - start)
+        HA_REQUESTS.labels(str(response.status_code)).inc()
+        logging.debug(f"调用 HA REST API POST {url}，返回 {response.status_code}: {response.content}")
+        ok = 200 <= response.status_code < 300
+        return PushResult(entity_id, ok, response.status_code,
+                          None if ok else response.text[:200], time.perf_counter() - start)
+
+    def get_state_status(self, entity_id):
+        """查询实体是否存在，返回 HTTP 状态码，请求失败时返回 None。"""
+        try:
+            return self.session.get(self.base_url + API_PATH + entity_id, timeout=self.timeout).status_code
+        except requests.RequestException as e:
+            logging.debug(f"查询 HA 实体 {entity_id} 失败: {e}")
+            return None
+
+    def post_states(self, states):
+        """并发推送 [(entity_id, body)]，按输入顺序返回 PushResult 列表。"""
+        if len(states) <= 1 or self.workers == 1:
+            return [self.post_state(entity_id, body) for entity_id, body in states]
+        return list(self._executor.map(lambda state: self.post_state(*state), states))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,160 @@
+"""
+Import the scraped daily history into Home Assistant long-term statistics, so the Energy
+dashboard gets every day (total and valley/flat/peak/sharp) instead of only the latest
+measurement sensor value.
+
+Each household and bucket is one external statistic (sgcc:<bucket>_usage_<user_id>) with
+one row per day at local midnight. The cumulative sum continues from the last row HA
+already has before the imported range, so re-importing an overlapping window keeps the
+series continuous. All lookups of one household are pipelined, then every series is
+upserted with a single recorder/import_statistics call, over the WebSocket API (the only
+API that offers it).
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from ha_websocket import HAWebSocket, HAWebSocketError, websocket_url
+
+# 国网数据按北京时间记日
+CHINA_TZ = timezone(timedelta(hours=8))
+SOURCE = "sgcc"
+BUCKETS = (
+    ("total", "日用电"),
+    ("valley", "谷用电"),
+    ("flat", "平用电"),
+    ("peak", "峰用电"),
+    ("sharp", "尖用电"),
+)
+
+
+def statistic_id(bucket, user_id):
+    return f"{SOURCE}:{bucket}_usage_{user_id}"
+
+
+def day_start(date):
+    return datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=CHINA_TZ)
+
+
+class StatisticsImporter:
+
+    def __init__(self, ws):
+        """:param ws: 提供 call_many 的 WebSocket 连接（HAWebSocket 或 HAWebSocketClient）"""
+        self.ws = ws
+
+    @classmethod
+    def from_env(cls, client=None):
+        """STATISTICS_IMPORT 关闭时返回 None；client 已是 WebSocket 客户端时复用其连接。"""
+        if os.getenv("STATISTICS_IMPORT", "false").lower() != "true":
+            return None
+        if client is not None and hasattr(client, "call_many"):
+            return cls(client)
+        return cls(HAWebSocket(websocket_url(os.getenv("HASS_URL", "")), os.getenv("HASS_TOKEN", ""),
+                               float(os.getenv("HA_TIMEOUT_SECONDS", 10))))
+
+    def close(self):
+        """只关闭自行建立的连接，共用的 HAWebSocketClient 由其持有者关闭。"""
+        if isinstance(self.ws, HAWebSocket):
+            self.ws.close()
+
+    def _series(self, records):
+        """把日记录转换为 {bucket: [(日期, 值)]}，按日期升序，去掉缺失值。"""
+        records = sorted((r for r in records if r.get("date")), key=lambda r: r["date"])
+        series = {}
+        for bucket, _ in BUCKETS:
+            points = [(r["date"], float(r[bucket])) for r in records if r.get(bucket) is not None]
+            if points:
+                series[bucket] = points
+        return series
+
+    def _base_sums(self, user_id, series):
+        """查询每个序列在导入区间之前 HA 已有的累计值，没有则为 0。"""
+        buckets = list(series)
+        messages = [{
+            "type": "recorder/statistics_during_period",
+            "start_time": datetime(2000, 1, 1, tzinfo=CHINA_TZ).isoformat(),
+            "end_time": day_start(series[bucket][0][0]).isoformat(),
+            "statistic_ids": [statistic_id(bucket, user_id)],
+            "period": "month",
+            "types": ["sum"],
+        } for bucket in buckets]
+        bases = {}
+        for bucket, result in zip(buckets, self.ws.call_many(messages)):
+            rows = (result.get("result") or {}).get(statistic_id(bucket, user_id)) if result.get("success") else None
+            bases[bucket] = (rows[-1].get("sum") or 0.0) if rows else 0.0
+        return bases
+
+    def import_records(self, user_id, records):
+        """导入一个户号的日记录，返回写入的行数；失败时记录日志并返回 0。"""
+        series = self._series(records or [])
+        if not series:
+            return 0
+        try:
+            bases = self._base_sums(user_id, series)
+            messages = []
+            for bucket, label in BUCKETS:
+                if bucket not in series:
+                    continue
+                total = bases[bucket]
+                stats = []
+                for date, value in series[bucket]:
+                    total += value
+                    stats.append({"start": day_start(date).isoformat(), "state": value, "sum": round(total, 3)})
+                messages.append({
+                    "type": "recorder/import_statistics",
+                    "metadata": {
+                        "has_mean": False,
+                        "has_sum": True,
+                        "name": f"国网 {user_id[-4:]} {label}",
+                        "source": SOURCE,
+                        "statistic_id": statistic_id(bucket, user_id),
+                        "unit_of_measurement": "kWh",
+                    },
+                    "stats": stats,
+                })
+            results = self.ws.call_many(messages)
+        except HAWebSocketError as e:
+            logging.error(f"户号 {user_id} 长期统计导入失败: {e}")
+            return 0
+        rows = 0
+        for message, result in zip(messages, results):
+            if result.get("success"):
+                rows += len(message["stats"])
+            else:
+                logging.error(f"长期统计 {message['metadata']['statistic_id']} 导入失败: {result.get('error')}")
+        first, last = min(p[0][0] for p in series.values()), max(p[-1][0] for p in series.values())
+        logging.info(f"户号 {user_id} 已导入长期统计 {rows} 行（{first} ~ {last}）。")
+        return rows
+
+    def backfill(self, db_path):
+        """把数据库中已保存的全部日用电（daily 表）与分时数据（tou 表）导入长期统计。"""
+        if not os.path.isfile(db_path):
+            logging.info(f"数据库 {db_path} 不存在，无需回填长期统计。")
+            return 0
+        connect = sqlite3.connect(db_path)
+        try:
+            tables = [row[0] for row in connect.execute("SELECT name FROM sqlite_master WHERE type='table';")]
+            users = {}
+            for table in tables:
+                if table.startswith("daily") and table[len("daily"):].isdigit():
+                    user_records = users.setdefault(table[len("daily"):], {})
+                    for date, usage in connect.execute(f"SELECT date, usage FROM {table};"):
+                        user_records.setdefault(date, {"date": date})["total"] = usage
+            for table in tables:
+                if table.startswith("tou") and table[len("tou"):].isdigit():
+                    user_records = users.setdefault(table[len("tou"):], {})
+                    for date, total, valley, flat, peak, sharp in connect.execute(
+                            f"SELECT date, total, valley, flat, peak, sharp FROM {table};"):
+                        record = user_records.setdefault(date, {"date": date})
+                        if total is not None:
+                            record["total"] = total
+                        record.update(valley=valley, flat=flat, peak=peak, sharp=sharp)
+        finally:
+            connect.close()
+        rows = 0
+        for user_id, records in users.items():
+            logging.info(f"回填户号 {user_id} 的长期统计，共 {len(records)} 天。")
+            rows += self.import_records(user_id, list(records.values()))
+        return rows
@@ -0,0 +1,180 @@
+"""
+Home Assistant WebSocket transport. One authenticated connection is kept open and all
+commands of a batch are pipelined over it (sent at once, answers matched by id), with an
+automatic reconnect when the connection drops.
+
+HA's WebSocket API has no command for writing an arbitrary entity state (POST
+/api/states/<entity_id> is REST-only), so HAWebSocketClient still writes states over the
+pooled REST session. Over the WebSocket it answers "does this entity exist" from a single
+get_states snapshot instead of one GET per household, and it carries commands that only
+exist there, such as recorder statistics imports. Whenever the WebSocket is unavailable
+it falls back to REST and retries the WebSocket after a cool-down.
+"""
+
+import json
+import logging
+import threading
+import time
+
+import websocket
+
+from ha_client import HAClient
+
+# WebSocket 不可用后多久再尝试连接（秒）
+RETRY_AFTER_SECONDS = 300
+# get_states 快照的有效期（秒）
+SNAPSHOT_MAX_AGE = 120
+
+
+class HAWebSocketError(Exception):
+    pass
+
+
+def websocket_url(base_url):
+    base_url = base_url.rstrip("/")
+    if base_url.startswith("https://"):
+        return "wss://" + base_url[len("https://"):] + "/api/websocket"
+    if base_url.startswith("http://"):
+        return "ws://" + base_url[len("http://"):] + "/api/websocket"
+    return base_url + "/api/websocket"
+
+
+class HAWebSocket:
+
+    def __init__(self, url, token, timeout=10):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self._ws = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        ws = websocket.create_connection(self.url, timeout=self.timeout)
+        try:
+            message = json.loads(ws.recv())
+            if message.get("type") != "auth_required":
+                raise HAWebSocketError(f"WebSocket 握手异常: {message}")
+            ws.send(json.dumps({"type": "auth", "access_token": self.token}))
+            message = json.loads(ws.recv())
+            if message.get("type") != "auth_ok":
+                raise HAWebSocketError(f"WebSocket 认证失败: {message.get('message', message.get('type'))}")
+        except BaseException:
+            ws.close()
+            raise
+        logging.info(f"已连接 HA WebSocket {self.url}，版本 {message.get('ha_version')}。")
+        self._ws = ws
+        self._next_id = 1
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+            self._ws = None
+
+    def call_many(self, messages):
+        """
+        一次性发送多条命令再依次接收结果，返回与 messages 顺序一致的 result 消息。
+        连接断开时重连并整体重发一次，仍失败则抛出 HAWebSocketError。
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._ws is None:
+                        self._connect()
+                    return self._exchange(messages)
+                except (websocket.WebSocketException, OSError, ValueError) as e:
+                    self._close()
+                    if attempt == 2:
+                        raise HAWebSocketError(f"WebSocket 通信失败: {e}") from e
+                    logging.info(f"HA WebSocket 连接中断（{e}），重新连接。")
+                except HAWebSocketError:
+                    self._close()
+                    raise
+
+    def call(self, message):
+        """发送一条命令，失败的结果抛出 HAWebSocketError。"""
+        result = self.call_many([message])[0]
+        if not result.get("success"):
+            raise HAWebSocketError(f"命令 {message.get('type')} 执行失败: {result.get('error')}")
+        return result.get("result")
+
+    def _exchange(self, messages):
+        ids = []
+        for message in messages:
+            ids.append(self._next_id)
+            self._ws.send(json.dumps({**message, "id": self._next_id}))
+            self._next_id += 1
+        pending = set(ids)
+        results = {}
+        while len(results) < len(ids):
+            message = json.loads(self._ws.recv())
+            # ping 的应答是 pong，其余命令是 result；忽略订阅事件等其他消息
+            if message.get("type") == "pong":
+                message = {**message, "success": True}
+            if message.get("type") in ("result", "pong") and message.get("id") in pending:
+                results[message["id"]] = message
+        return [results[i] for i in ids]
+
+
+class HAWebSocketClient(HAClient):
+    """状态写入走 REST 连接池，查询与统计导入走 WebSocket，WebSocket 不可用时退回 REST。"""
+
+    def __init__(self, base_url, token, timeout=10, workers=4):
+        super().__init__(base_url, token, timeout=timeout, workers=workers)
+        self.ws = HAWebSocket(websocket_url(self.base_url), token, timeout)
+        self._retry_at = 0
+        self._snapshot = None
+        self._snapshot_at = 0
+        self._snapshot_lock = threading.Lock()
+
+    @property
+    def websocket_available(self):
+        return time.monotonic() >= self._retry_at
+
+    def call_many(self, messages):
+        """
+        通过 WebSocket 批量执行命令；不可用时抛出 HAWebSocketError，
+        并在 RETRY_AFTER_SECONDS 内不再尝试，调用方应退回 REST。
+        """
+        if not self.websocket_available:
+            raise HAWebSocketError("WebSocket 暂不可用。")
+        try:
+            return self.ws.call_many(messages)
+        except HAWebSocketError as e:
+            self._retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+            logging.warning(f"{e}，{RETRY_AFTER_SECONDS}s 内改用 REST。")
+            raise
+
+    def _entity_ids(self):
+        with self._snapshot_lock:
+            if self._snapshot is None or time.monotonic() - self._snapshot_at > SNAPSHOT_MAX_AGE:
+                result = self.call_many([{"type": "get_states"}])[0]
+                if not result.get("success"):
+                    raise HAWebSocketError(f"get_states 失败: {result.get('error')}")
+                self._snapshot = {state["entity_id"] for state in result.get("result") or []}
+                self._snapshot_at = time.monotonic()
+            return self._snapshot
+
+    def get_state_status(self, entity_id):
+        try:
+            return 200 if entity_id in self._entity_ids() else 404
+        except HAWebSocketError:
+            return super().get_state_status(entity_id)
+
+    def post_states(self, states):
+        results = super().post_states(states)
+        with self._snapshot_lock:
+            if self._snapshot is not None:
+                self._snapshot.update(result.entity_id for result in results if result.ok)
+        return results
+
+    def close(self):
+        self.ws.close()
+        super().close()
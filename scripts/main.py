@@ -8,6 +8,7 @@ import time
 import schedule
 import json
 import random
+import signal
 from datetime import datetime, timedelta
 
 
@@ -36,6 +37,18 @@ apply_local_overrides()
 from error_watcher import ErrorWatcher
 from const import *
 from data_fetcher import DataFetcher
+from driver_pool import DriverPool
+from account_pool import AccountPool, load_accounts
+from onnx import ONNX
+from ha_client import create_client
+from push_cache import PushCache
+from sensor_updator import VOLATILE_ATTRIBUTES
+from ha_statistics import StatisticsImporter
+from outbox import Outbox
+from metrics import RUN_FAILURES, account_label, start_metrics_server
+import scheduler
+from freshness import AdaptiveSchedule, FreshnessStore
+from scheduler import RunWatchdog, backoff_delay, run_forever, shutdown_event
 
 def main():
     global RETRY_TIMES_LIMIT
@@ -69,7 +82,46 @@ def main():
             os.environ["RECHARGE_NOTIFY"] = str(options.get("RECHARGE_NOTIFY", "false")).lower()
             os.environ["BALANCE"] = str(options.get("BALANCE", 5.0))
             os.environ["PUSHPLUS_TOKEN"] = options.get("PUSHPLUS_TOKEN", "")
+            os.environ["HA_TIMEOUT_SECONDS"] = str(options.get("HA_TIMEOUT_SECONDS", 10))
+            os.environ["HA_PUSH_WORKERS"] = str(options.get("HA_PUSH_WORKERS", 4))
+            os.environ["HA_TRANSPORT"] = options.get("HA_TRANSPORT", "rest")
+            os.environ["HA_SKIP_UNCHANGED"] = str(options.get("HA_SKIP_UNCHANGED", "true")).lower()
+            os.environ["HA_FORCE_REFRESH_HOURS"] = str(options.get("HA_FORCE_REFRESH_HOURS", 24))
+            os.environ["HA_OUTBOX"] = str(options.get("HA_OUTBOX", "true")).lower()
+            os.environ["STATISTICS_IMPORT"] = str(options.get("STATISTICS_IMPORT", "false")).lower()
+            os.environ["STATISTICS_BACKFILL"] = str(options.get("STATISTICS_BACKFILL", "false")).lower()
             os.environ["RUN_AT_START"] = str(options.get("RUN_AT_START", "true")).lower()
+            os.environ["SCHEDULE_MODE"] = options.get("SCHEDULE_MODE", "fixed")
+            os.environ["ADAPTIVE_PROBE_INTERVAL_MINUTES"] = str(options.get("ADAPTIVE_PROBE_INTERVAL_MINUTES", 60))
+            os.environ["ADAPTIVE_MAX_PROBES"] = str(options.get("ADAPTIVE_MAX_PROBES", 6))
+            os.environ["RUN_TIMEOUT_MINUTES"] = str(options.get("RUN_TIMEOUT_MINUTES", 30))
+            os.environ["RETRY_BACKOFF_SECONDS"] = str(options.get("RETRY_BACKOFF_SECONDS", 60))
+            os.environ["RETRY_BACKOFF_MAX_SECONDS"] = str(options.get("RETRY_BACKOFF_MAX_SECONDS", 1800))
+            os.environ["METRICS_PORT"] = str(options.get("METRICS_PORT", 0))
+            os.environ["ACCOUNTS"] = json.dumps(options.get("ACCOUNTS", []))
+            os.environ["ACCOUNT_WORKERS"] = str(options.get("ACCOUNT_WORKERS", 1))
+            os.environ["ACCOUNT_STAGGER_MINUTES"] = str(options.get("ACCOUNT_STAGGER_MINUTES", 10))
+            os.environ["DATA_SOURCE"] = options.get("DATA_SOURCE", "dom")
+            os.environ["PARALLEL_TABS"] = str(options.get("PARALLEL_TABS", 1))
+            os.environ["DAILY_INCREMENTAL"] = str(options.get("DAILY_INCREMENTAL", "false")).lower()
+            os.environ["DAILY_BULK_EXTRACT"] = str(options.get("DAILY_BULK_EXTRACT", "true")).lower()
+            os.environ["WAIT_MODE"] = options.get("WAIT_MODE", "event")
+            os.environ["BROWSER_PROFILE"] = options.get("BROWSER_PROFILE", "default")
+            os.environ["BROWSER_ALLOWED_HOSTS"] = options.get("BROWSER_ALLOWED_HOSTS", "")
+            os.environ["BROWSER_POOL_SIZE"] = str(options.get("BROWSER_POOL_SIZE", 0))
+            os.environ["BROWSER_MAX_USES"] = str(options.get("BROWSER_MAX_USES", 10))
+            os.environ["BROWSER_MAX_RSS_MB"] = str(options.get("BROWSER_MAX_RSS_MB", 1024))
+            os.environ["BROWSER_ACQUIRE_TIMEOUT_SECONDS"] = str(options.get("BROWSER_ACQUIRE_TIMEOUT_SECONDS", 600))
+            os.environ["SESSION_REUSE"] = str(options.get("SESSION_REUSE", "true")).lower()
+            os.environ["SNAPSHOT_LEVEL"] = options.get("SNAPSHOT_LEVEL", "full")
+            os.environ["SNAPSHOT_FORMAT"] = options.get("SNAPSHOT_FORMAT", "png")
+            os.environ["SNAPSHOT_SCALE"] = str(options.get("SNAPSHOT_SCALE", 1.0))
+            os.environ["SNAPSHOT_MAX_MB"] = str(options.get("SNAPSHOT_MAX_MB", 200))
+            os.environ["SLIDER_CAPTURE_MODE"] = options.get("SLIDER_CAPTURE_MODE", "png")
+            os.environ["ONNX_INTRA_OP_THREADS"] = str(options.get("ONNX_INTRA_OP_THREADS", 0))
+            os.environ["ONNX_INTER_OP_THREADS"] = str(options.get("ONNX_INTER_OP_THREADS", 0))
+            os.environ["ONNX_EXECUTION_MODE"] = options.get("ONNX_EXECUTION_MODE", "sequential")
+            os.environ["ONNX_GRAPH_OPTIMIZATION_LEVEL"] = options.get("ONNX_GRAPH_OPTIMIZATION_LEVEL", "all")
             RUN_AT_START = str(options.get("RUN_AT_START", "true")).lower() == "true"
             logging.info(f"当前以 Homeassistant 插件形式运行。")
         except Exception as e:
@@ -99,38 +151,161 @@ def main():
     logging.info(f"开始初始化 ErrorWatcher。")
     ErrorWatcher.init(root_dir='/data/errors')
     logging.info(f'ErrorWatcher 初始化完成。')
-    fetcher = DataFetcher(PHONE_NUMBER, PASSWORD)
+    start_metrics_server()
+    accounts = load_accounts(PHONE_NUMBER, PASSWORD)
+    if not accounts:
+        logging.error("未配置任何账号，程序将退出。")
+        sys.exit()
+    # 所有账号共用一份验证码模型，推理在模型内部加锁
+    captcha_model = ONNX("./captcha.onnx")
+    # 所有账号共用一个 HA 连接池
+    ha_client = create_client()
+    push_cache = PushCache.from_env(volatile_attributes=VOLATILE_ATTRIBUTES)
+    statistics = StatisticsImporter.from_env(ha_client)
+    # HA 不可达时失败的推送落盘，由后台线程在 HA 恢复后补推，上次退出时遗留的记录也会补推
+    outbox = Outbox.from_env(ha_client, push_cache)
+    if outbox is not None:
+        outbox.start()
+    fetchers = [
+        DataFetcher(
+            account["PHONE_NUMBER"],
+            account["PASSWORD"],
+            onnx=captcha_model,
+            ha_client=ha_client,
+            push_cache=push_cache,
+            statistics=statistics,
+            outbox=outbox,
+            ignore_user_id=account.get("IGNORE_USER_ID"),
+            retry_times_limit=account.get("RETRY_TIMES_LIMIT"),
+        )
+        for account in accounts
+    ]
+    # 浏览器池由主循环持有，在两次定时任务之间保持浏览器常驻，多个账号共用
+    driver_pool = DriverPool.from_env(fetchers[0]._get_webdriver)
+    if driver_pool is not None:
+        logging.info(f"启用浏览器池，实例数 {driver_pool.size}。")
+        driver_pool.start()
+        for fetcher in fetchers:
+            fetcher.driver_pool = driver_pool
+    if os.getenv("STATISTICS_BACKFILL", "false").lower() == "true":
+        if statistics is None:
+            logging.warning("STATISTICS_BACKFILL 需要同时开启 STATISTICS_IMPORT，跳过回填。")
+        else:
+            logging.info("STATISTICS_BACKFILL=true，将数据库中已保存的日用电回填到 HA 长期统计。")
+            statistics.backfill(fetchers[0]._db_path())
+    account_pool = AccountPool(run_task, int(os.getenv("ACCOUNT_WORKERS", 1)))
+    stagger_minutes = int(os.getenv("ACCOUNT_STAGGER_MINUTES", 10))
+    if len(fetchers) > 1:
+        logging.info(f"共 {len(fetchers)} 个账号，最多同时执行 {account_pool.workers} 个，相邻账号错开 {stagger_minutes} 分钟。")
 
     # 生成随机延迟时间（-10分钟到+10分钟）
     random_delay_minutes = random.randint(-10, 10)
     parsed_time = datetime.strptime(JOB_START_TIME, "%H:%M") + timedelta(minutes=random_delay_minutes)
-    logging.info(f"当前账号: {PHONE_NUMBER}，Home Assistant 地址: {HASS_URL}，每日执行时间: {parsed_time.strftime('%H:%M')}。")
 
-    # 添加随机延迟
-    next_run_time = parsed_time + timedelta(hours=12)
+    # adaptive：按各账号历史上新数据出现的时间探测，当天拿到新数据后不再执行
+    schedule_mode = os.getenv("SCHEDULE_MODE", "fixed").lower()
+    freshness_store = FreshnessStore(fetchers[0]._db_path()) if schedule_mode == "adaptive" else None
 
-    logging.info(f'每日计划两次执行，时间 {parsed_time.strftime("%H:%M")} 和 {next_run_time.strftime("%H:%M")}')
-    schedule.every().day.at(parsed_time.strftime("%H:%M")).do(run_task, fetcher)
-    schedule.every().day.at(next_run_time.strftime("%H:%M")).do(run_task, fetcher)
+    for index, fetcher in enumerate(fetchers):
+        # 各账号依次错开，避免同时登录
+        start_time = parsed_time + timedelta(minutes=index * stagger_minutes)
+        if freshness_store is not None:
+            adaptive = AdaptiveSchedule(
+                freshness_store,
+                fetcher,
+                account_pool.submit,
+                start_time,
+                probe_interval=int(os.getenv("ADAPTIVE_PROBE_INTERVAL_MINUTES", 60)),
+                max_probes=int(os.getenv("ADAPTIVE_MAX_PROBES", 6)),
+            )
+            logging.info(f"当前账号: {fetcher._username}，Home Assistant 地址: {HASS_URL}，按数据更新时间自动调度，无历史时首次探测时间: {start_time.strftime('%H:%M')}。")
+            if not RUN_AT_START:
+                adaptive.plan()
+            elif index == 0 or stagger_minutes <= 0:
+                adaptive.run_now()
+            else:
+                schedule.every(index * stagger_minutes).minutes.do(run_once, adaptive.run_now)
+            continue
+        logging.info(f"当前账号: {fetcher._username}，Home Assistant 地址: {HASS_URL}，每日执行时间: {start_time.strftime('%H:%M')}。")
+
+        # 添加随机延迟
+        next_run_time = start_time + timedelta(hours=12)
+
+        logging.info(f'每日计划两次执行，时间 {start_time.strftime("%H:%M")} 和 {next_run_time.strftime("%H:%M")}')
+        schedule.every().day.at(start_time.strftime("%H:%M")).do(account_pool.submit, fetcher)
+        schedule.every().day.at(next_run_time.strftime("%H:%M")).do(account_pool.submit, fetcher)
+        if RUN_AT_START:
+            if index == 0 or stagger_minutes <= 0:
+                account_pool.submit(fetcher)
+            else:
+                schedule.every(index * stagger_minutes).minutes.do(run_once, account_pool.submit, fetcher)
     if RUN_AT_START:
         logging.info('RUN_AT_START=true，启动即执行一次任务。')
-        run_task(fetcher)
     else:
         logging.info('RUN_AT_START=false，启动时不立即执行任务。')
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    # 容器停止时结束调度等待与重试退避，并终止正在进行的任务
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    try:
+        run_forever(shutdown_event)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        logging.info("收到退出信号，停止调度。")
+        account_pool.shutdown()
+        for fetcher in fetchers:
+            fetcher.abort()
+        if driver_pool is not None:
+            driver_pool.close()
+        if outbox is not None:
+            outbox.close()
+        if statistics is not None:
+            statistics.close()
+        ha_client.close()
+
+
+def run_once(func, *args):
+    """启动时错开执行的一次性任务。"""
+    func(*args)
+    return schedule.CancelJob
 
 
 def run_task(data_fetcher: DataFetcher):
-    for retry_times in range(1, RETRY_TIMES_LIMIT + 1):
+    # 每个账号使用自己的重试次数
+    retry_times_limit = data_fetcher.RETRY_TIMES_LIMIT
+    # 整个任务（含重试）的时间上限，超时后终止并回收浏览器，不占用下一个时间段
+    run_timeout = int(os.getenv("RUN_TIMEOUT_MINUTES", 30)) * 60
+    backoff_base = int(os.getenv("RETRY_BACKOFF_SECONDS", 60))
+    backoff_max = int(os.getenv("RETRY_BACKOFF_MAX_SECONDS", 1800))
+    deadline = time.monotonic() + run_timeout if run_timeout > 0 else None
+    for retry_times in range(1, retry_times_limit + 1):
+        remaining = max(1, deadline - time.monotonic()) if deadline is not None else 0
+        watchdog = RunWatchdog(data_fetcher, remaining)
         try:
-            data_fetcher.fetch()
-            return
+            with watchdog:
+                status = data_fetcher.fetch()
         except Exception as e:
-            logging.error(f"任务失败: {e}，剩余重试 {RETRY_TIMES_LIMIT - retry_times} 次。")
-            continue
+            error, reason = e, "error"
+        else:
+            if status == "success" and not watchdog.fired:
+                return
+            # 登录或滑块失败时 fetch 返回状态而不抛异常，同样需要重试
+            error, reason = f"状态 {status}", status
+        if watchdog.fired:
+            RUN_FAILURES.labels(account_label(data_fetcher._username), "timeout").inc()
+            logging.error(f"任务超时，放弃剩余重试，等待下一次计划执行。")
+            return
+        RUN_FAILURES.labels(account_label(data_fetcher._username), reason).inc()
+        if retry_times == retry_times_limit or shutdown_event.is_set():
+            logging.error(f"任务失败: {error}，已无剩余重试。")
+            return
+        delay = backoff_delay(retry_times, backoff_base, backoff_max)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            logging.error(f"任务失败: {error}，剩余时间不足以再次重试，等待下一次计划执行。")
+            return
+        logging.error(f"任务失败: {error}，{delay:.0f}s 后重试，剩余重试 {retry_times_limit - retry_times} 次。")
+        if shutdown_event.wait(delay):
+            return
 
 def logger_init(level: str):
     logger = logging.getLogger()
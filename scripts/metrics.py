@@ -0,0 +1,47 @@
+"""
+Prometheus metrics for the add-on. The metric objects are always defined so the scraper can
+update them unconditionally; the HTTP endpoint is only started when METRICS_PORT is set and
+is served by prometheus_client's own daemon thread, never by the scraping thread.
+"""
+
+import logging
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+RUN_DURATION = Histogram(
+    "sgcc_run_duration_seconds", "一次抓取任务的总耗时", ["account", "status"],
+    buckets=(30, 60, 120, 180, 300, 450, 600, 900, 1200, 1800))
+RUN_FAILURES = Counter("sgcc_run_failures_total", "抓取任务失败次数（每次尝试计一次）", ["account", "reason"])
+LOGIN_ATTEMPTS = Counter("sgcc_login_attempts_total", "完整登录（含滑块）次数", ["account"])
+SLIDER_ATTEMPTS = Counter("sgcc_slider_attempts_total", "滑块尝试次数", ["account", "result"])
+ONNX_INFERENCE = Histogram(
+    "sgcc_onnx_inference_seconds", "验证码模型单次推理耗时（含预处理）",
+    buckets=(0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2, 5))
+SLIDER_DISTANCE = Histogram(
+    "sgcc_slider_distance_pixels", "模型识别出的滑块缺口距离",
+    buckets=(0, 25, 50, 75, 100, 125, 150, 175, 200, 250, 300, 416))
+HA_REQUEST_DURATION = Histogram(
+    "sgcc_ha_request_seconds", "向 Home Assistant 推送一个实体的耗时",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+HA_REQUESTS = Counter("sgcc_ha_requests_total", "向 Home Assistant 推送的次数", ["status"])
+HA_WRITES = Counter("sgcc_ha_writes_total", "实体写入结果：sent 已推送，skipped 未变化跳过", ["result"])
+LAST_SUCCESS = Gauge("sgcc_last_success_timestamp_seconds", "户号最近一次成功抓取并推送的时间", ["user_id"])
+
+
+def account_label(username):
+    return username[-4:] if username else ""
+
+
+def start_metrics_server():
+    """METRICS_PORT 大于 0 时在后台线程启动指标接口，返回是否已启动。"""
+    port = int(os.getenv("METRICS_PORT", 0))
+    if port <= 0:
+        return False
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logging.error(f"指标接口启动失败，端口 {port}: {e}")
+        return False
+    logging.info(f"指标接口已启动: http://0.0.0.0:{port}/metrics")
+    return True
@@ -1,17 +1,151 @@
 # import cv2
+import logging
+import os
+import platform
+import threading
+import time
+
 from PIL import ImageDraw,Image,ImageOps
 import numpy as np
 import onnxruntime
 
+from metrics import ONNX_INFERENCE, SLIDER_DISTANCE
+
 anchors = [[(116,90),(156,198),(373,326)],[(30,61),(62,45),(59,119)],[(10,13),(16,30),(33,23)]]
 anchors_yolo_tiny = [[(81, 82), (135, 169), (344, 319)], [(10, 14), (23, 27), (37, 58)]]
 CLASSES=["target"]
-
+MODEL_INPUT_SIZE = 416
+
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def _choice(name, value, choices, default):
+    """校验枚举型配置，无效时记录警告并返回默认值。"""
+    key = str(value).strip().lower()
+    if key in choices:
+        return key
+    logging.warning(f"{name}={value} 无效，可选值为 {'/'.join(choices)}，改用默认值 {default}。")
+    return default
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logging.warning(f"{name}={os.getenv(name)} 不是整数，改用默认值 {default}。")
+        return default
+
+
+def default_optimized_model_path(onnx_file_name, optimization_level):
+    """优化后模型的缓存路径，Docker 中放在 /data 下以便重启后复用。
+
+    优化结果与硬件和图优化级别相关，文件名带上 CPU 架构、onnxruntime 版本和优化级别，
+    修改 ONNX_GRAPH_OPTIMIZATION_LEVEL 后会重新生成而不是沿用旧级别的缓存。
+    """
+    base = os.path.splitext(os.path.basename(onnx_file_name))[0]
+    file_name = f"{base}.{platform.machine()}.ort{onnxruntime.__version__}.{optimization_level}.opt.onnx"
+    if 'PYTHON_IN_DOCKER' in os.environ:
+        return os.path.join("/data", file_name)
+    return os.path.join(os.path.dirname(os.path.abspath(onnx_file_name)), file_name)
+
+
+def create_session(
+    onnx_file_name,
+    intra_op_threads=None,
+    inter_op_threads=None,
+    execution_mode=None,
+    optimization_level=None,
+    optimized_model_path=None,
+    warmup=True,
+):
+    """创建 onnxruntime 推理会话。
+
+    未传入的参数从环境变量读取（ONNX_INTRA_OP_THREADS、ONNX_INTER_OP_THREADS、
+    ONNX_EXECUTION_MODE、ONNX_GRAPH_OPTIMIZATION_LEVEL、ONNX_OPTIMIZED_MODEL_PATH）。
+    首次启动时把图优化结果写入 optimized_model_path，之后直接加载该文件并跳过图优化；
+    原模型比缓存新时重新生成。optimized_model_path 为空字符串时不做缓存；
+    自行指定的路径会在扩展名前插入优化级别，不同级别的缓存互不覆盖。
+    """
+    if intra_op_threads is None:
+        intra_op_threads = _env_int("ONNX_INTRA_OP_THREADS", 0)
+    if inter_op_threads is None:
+        inter_op_threads = _env_int("ONNX_INTER_OP_THREADS", 0)
+    if execution_mode is None:
+        execution_mode = os.getenv("ONNX_EXECUTION_MODE", "sequential")
+    if optimization_level is None:
+        optimization_level = os.getenv("ONNX_GRAPH_OPTIMIZATION_LEVEL", "all")
+    execution_mode = _choice("ONNX_EXECUTION_MODE", execution_mode, EXECUTION_MODES, "sequential")
+    optimization_level = _choice("ONNX_GRAPH_OPTIMIZATION_LEVEL", optimization_level, GRAPH_OPTIMIZATION_LEVELS, "all")
+    if optimized_model_path is None:
+        optimized_model_path = os.getenv("ONNX_OPTIMIZED_MODEL_PATH")
+        if not optimized_model_path:
+            optimized_model_path = default_optimized_model_path(onnx_file_name, optimization_level)
+        else:
+            root, ext = os.path.splitext(optimized_model_path)
+            optimized_model_path = f"{root}.{optimization_level}{ext}"
+
+    def build_options(level):
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads  # 0 表示由 onnxruntime 决定
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = EXECUTION_MODES[execution_mode]
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[level]
+        return options
+
+    start = time.perf_counter()
+    session = None
+    if optimized_model_path and os.path.isfile(optimized_model_path) \
+            and os.path.getmtime(optimized_model_path) >= os.path.getmtime(onnx_file_name):
+        try:
+            # 缓存的模型已经优化过，不再重复做图优化
+            session = onnxruntime.InferenceSession(optimized_model_path, build_options("disable"))
+            logging.info(f"已加载优化后的验证码模型 {optimized_model_path}。")
+        except Exception as e:
+            logging.warning(f"加载优化后的模型 {optimized_model_path} 失败，重新生成: {e}")
+            session = None
+
+    if session is None:
+        options = build_options(optimization_level)
+        if optimized_model_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(optimized_model_path)), exist_ok=True)
+                options.optimized_model_filepath = optimized_model_path
+            except OSError as e:
+                logging.warning(f"无法写入优化后的模型 {optimized_model_path}: {e}")
+        session = onnxruntime.InferenceSession(onnx_file_name, options)
+        logging.info(f"已加载验证码模型 {onnx_file_name}，图优化级别 {optimization_level}。")
+    load_time = time.perf_counter() - start
+
+    if warmup:
+        start = time.perf_counter()
+        model_input = session.get_inputs()[0]
+        # 动态维度：batch 取 1，其余取模型输入尺寸
+        shape = [d if isinstance(d, int) else (1 if i == 0 else MODEL_INPUT_SIZE)
+                 for i, d in enumerate(model_input.shape)]
+        session.run(None, {model_input.name: np.zeros(shape, dtype=np.float32)})
+        logging.info(f"验证码模型加载耗时 {load_time:.2f}s，预热推理耗时 {time.perf_counter() - start:.2f}s。")
+    return session
 
 
 class ONNX:
-    def __init__(self,onnx_file_name="captcha.onnx"):
-        self.onnx_session = onnxruntime.InferenceSession(onnx_file_name) 
+    def __init__(self,onnx_file_name="captcha.onnx", **session_options):
+        self.onnx_session = create_session(onnx_file_name, **session_options)
+        self._input_name = self.onnx_session.get_inputs()[0].name
+        self._output_name = self.onnx_session.get_outputs()[0].name
+        # 预分配的 NCHW 输入缓冲区，预处理直接写入，批量推理时按需扩容
+        self._input_buffer = np.empty((1, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+        self._use_io_binding = hasattr(self.onnx_session, "io_binding")
+        # 缓冲区在多次调用间复用，推理需串行
+        self._lock = threading.Lock()
 
     # sigmoid函数
     def sigmoid(self,x):
@@ -41,7 +175,8 @@ class ONNX:
 
     # dets:  array [x,6] 6个值分别为x1,y1,x2,y2,score,class
     # thresh: 阈值
-    def nms(self,dets, thresh):
+    # classes: 可选，每个框的类别；传入时只在同类框之间做抑制（批量 NMS）
+    def nms(self,dets, thresh, classes=None):
         # dets:x1 y1 x2 y2 score class
         # x[:,n]就是取所有集合的第n个数据
         x1 = dets[:, 0]
@@ -58,6 +193,9 @@ class ONNX:
         keep = []
         index = scores.argsort()[::-1]  # np.argsort()对某维度从小到大排序
         # [::-1] 从最后一个元素到第一个元素复制一遍。倒序从而从大到小排序
+        if classes is not None and len(index) > 0:
+            # 按类别分组（稳定排序，组内仍按置信度从大到小），与逐类别 NMS 的输出顺序一致
+            index = index[np.argsort(classes[index], kind="stable")]
 
         while index.size > 0:
             i = index[0]
@@ -78,10 +216,13 @@ class ONNX:
             overlaps = w * h
             # -------------------------------------------------------
             #   计算该框与其它框的IOU，去除掉重复的框，即IOU值大的框
-            #	IOU小于thresh的框保留下来
+            #	IOU小于thresh的框保留下来；不同类别的框互不抑制
             # -------------------------------------------------------
             ious = overlaps / (areas[i] + areas[index[1:]] - overlaps)
-            idx = np.where(ious <= thresh)[0]
+            remain = ious <= thresh
+            if classes is not None:
+                remain |= classes[index[1:]] != classes[i]
+            idx = np.where(remain)[0]
             index = index[idx + 1]
         return keep
 
@@ -118,47 +259,33 @@ class ONNX:
         #   删除为1的维度
         #	删除置信度小于conf_thres的BOX
         # -------------------------------------------------------
-        # for i in range(len(prediction)):
         feature_map = np.squeeze(prediction)# 删除数组形状中单维度条目(shape中为1的维度)
         # […,4]：代表了取最里边一层的所有第4号元素，…代表了对:,:,:,等所有的的省略。此处生成：25200个第四号元素组成的数组
         conf = feature_map[..., 4] > confidence_threshold  # 0 1 2 3 4 4是置信度，只要置信度 > conf_thres 的
-        box = feature_map[conf == True]  # 根据objectness score生成(n, 5+class_nm)，只留下符合要求的框
+        box = feature_map[conf]  # 根据objectness score生成(n, 5+class_nm)，只留下符合要求的框
+        if len(box) == 0:
+            return np.array([])
 
         # -------------------------------------------------------
-        #   通过argmax获取置信度最大的类别
+        #   一次 argmax 得到所有候选框置信度最大的类别
         # -------------------------------------------------------
-        cls_cinf = box[..., 5:]  # 左闭右开（5 6 7 8），就只剩下了每个grid cell中各类别的概率
-        cls = []
-        for i in range(len(cls_cinf)):
-            cls.append(int(np.argmax(cls_cinf[i])))  # 剩下的objecctness score比较大的grid cell，分别对应的预测类别列表
-        all_cls = list(set(cls))  # 去重，找出图中都有哪些类别
-        # set() 函数创建一个无序不重复元素集，可进行关系测试，删除重复数据，还可以计算交集、差集、并集等。
+        cls = np.argmax(box[:, 5:], axis=1)
         # -------------------------------------------------------
-        #   分别对每个类别进行过滤
+        #   批量处理所有类别
         #   1.将第6列元素替换为类别下标
         #	2.xywh2xyxy 坐标转换
-        #	3.经过非极大抑制后输出的BOX下标
+        #	3.按类别做批量非极大抑制，输出按类别分组、组内按置信度排序的下标
         #	4.利用下标取出非极大抑制后的BOX
         # -------------------------------------------------------
-        output = []
-        for i in range(len(all_cls)):
-            curr_cls = all_cls[i]
-            curr_cls_box = []
-            curr_out_box = []
-
-            for j in range(len(cls)):
-                if cls[j] == curr_cls:
-                    box[j][5] = curr_cls
-                    curr_cls_box.append(box[j][:6])  # 左闭右开，0 1 2 3 4 5
-
-            curr_cls_box = np.array(curr_cls_box)  # 0 1 2 3 4 5 分别是 x y w h score class
-            curr_cls_box = self.xywh2xyxy(curr_cls_box)  # 0 1 2 3 4 5 分别是 x1 y1 x2 y2 score class
-            curr_out_box = self.nms(curr_cls_box, nms_threshold)  # 获得nms后，剩下的类别在curr_cls_box中的下标
-
-            for k in curr_out_box:
-                output.append(curr_cls_box[k])
-        output = np.array(output)
-        return output
+        dets = box[:, :6].copy()  # 0 1 2 3 4 5 分别是 x y w h score class
+        dets[:, 5] = cls
+        dets = self.xywh2xyxy(dets)  # 0 1 2 3 4 5 分别是 x1 y1 x2 y2 score class
+        if cls.min() == cls.max():
+            # 单类别（滑块模型即如此）时无需分组，排序与逐类别实现完全一致
+            keep = self.nms(dets, nms_threshold)
+        else:
+            keep = self.nms(dets, nms_threshold, classes=cls)
+        return dets[keep]
 
     def letterbox(self, img, new_shape=(640, 640), color=(114, 114, 114), auto=False, scaleFill=False, scaleup=True,
                     stride=32):
@@ -199,28 +326,73 @@ class ONNX:
         img = ImageOps.expand(img, border=(left, top, right, bottom), fill=0)##left,top,right,bottom
         return img, ratio, (dw, dh)
 
+    def _preprocess(self, image, out):
+        """缩放到模型输入尺寸并归一化，结果直接写入 out（[3, 416, 416] float32），返回缩放后的原图。
+
+        image 可以是 PIL 图片，也可以是 HWC uint8 的 RGB(A) 数组（浏览器直接取出的像素）；
+        数组已是模型输入尺寸时跳过缩放。
+        """
+        if isinstance(image, np.ndarray) and image.shape[:2] == (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE):
+            org_img = pixels = image[..., :3]
+        else:
+            if isinstance(image, np.ndarray):
+                image = Image.fromarray(image)
+            # org_img = cv2.resize(image, [416, 416]) # resize后的原图 (640, 640, 3)
+            org_img = image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+            # img = cv2.cvtColor(org_img, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+            img = org_img if org_img.mode == "RGB" else org_img.convert("RGB")
+            pixels = np.asarray(img)  # HWC uint8
+        # HWC -> CHW 的转置只是视图，转 float32 与除以 255 一步写入缓冲区
+        np.divide(pixels.transpose(2, 0, 1), np.float32(255.0), out=out, dtype=np.float32, casting="unsafe")
+        return org_img
+
+    def _get_input_buffer(self, batch_size):
+        if self._input_buffer.shape[0] < batch_size:
+            self._input_buffer = np.empty((batch_size, 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), dtype=np.float32)
+        return self._input_buffer[:batch_size]
+
+    def _run(self, batch):
+        if self._use_io_binding:
+            try:
+                # IO binding 直接使用缓冲区内存作为输入，不再经过 feed 字典的拷贝与校验
+                binding = self.onnx_session.io_binding()
+                binding.bind_cpu_input(self._input_name, batch)
+                binding.bind_output(self._output_name)
+                self.onnx_session.run_with_iobinding(binding)
+                return binding.copy_outputs_to_cpu()[0]
+            except Exception as e:
+                logging.debug(f"IO binding 推理失败，改用普通推理: {e}")
+                self._use_io_binding = False
+        return self.onnx_session.run(None, {self._input_name: batch})[0]
+
     def _inference(self,image):
-        # org_img = cv2.resize(image, [416, 416]) # resize后的原图 (640, 640, 3)
-        org_img = image.resize((416,416))
-        # img = cv2.cvtColor(org_img, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
-        img = org_img.convert("RGB")
-        img = np.array(img).transpose(2, 0, 1)
-        img = img.astype(dtype=np.float32)  # onnx模型的类型是type: float32[ , , , ]
-        img /= 255.0
-        img = np.expand_dims(img, axis=0) # [3, 640, 640]扩展为[1, 3, 640, 640]
-
-        inputs = {self.onnx_session.get_inputs()[0].name: img} 
-        prediction = self.onnx_session.run(None, inputs)[0] 
+        with self._lock:
+            batch = self._get_input_buffer(1)  # [1, 3, 416, 416]
+            org_img = self._preprocess(image, batch[0])
+            prediction = self._run(batch)
         return prediction, org_img
 
-    def get_distance(self,image,draw=False):
-        prediction, org_img = self._inference(image)
-        boxes = self.get_boxes(prediction=prediction)
+    def _batch_inference(self, images):
+        """N 张图片拼成 [N, 3, 416, 416] 一次推理，返回 [N, 候选框数, 5+类别数] 的预测。"""
+        with self._lock:
+            batch = self._get_input_buffer(len(images))
+            org_imgs = [self._preprocess(image, batch[i]) for i, image in enumerate(images)]
+            batch_dim = self.onnx_session.get_inputs()[0].shape[0]
+            if isinstance(batch_dim, int) and batch_dim != len(images):
+                # 模型导出时固定了 batch 维度，只能逐张推理
+                predictions = np.concatenate([self._run(batch[i:i + 1]) for i in range(len(images))])
+            else:
+                predictions = self._run(batch)
+        return predictions, org_imgs
+
+    def _distance_from_boxes(self, boxes, org_img, draw=False):
         if len(boxes) == 0:
             print('No gaps were detected.')
             return 0
         else:
             if draw:
+                if isinstance(org_img, np.ndarray):
+                    org_img = Image.fromarray(org_img)
                 org_img = self.draw(org_img, boxes)
                 # cv2.imshow('result', org_img)
                 # cv2.imwrite('result.png', org_img)
@@ -228,6 +400,29 @@ class ONNX:
                 # cv2.waitKey(0)
             return int(boxes[..., :4].astype(np.int32)[0][0])
 
+    def get_distance(self,image,draw=False):
+        with ONNX_INFERENCE.time():
+            prediction, org_img = self._inference(image)
+        boxes = self.get_boxes(prediction=prediction)
+        distance = self._distance_from_boxes(boxes, org_img, draw)
+        SLIDER_DISTANCE.observe(distance)
+        return distance
+
+    def get_distances(self, images):
+        """批量识别多张滑块背景图的缺口距离，一次 session.run，按输入顺序返回距离列表。"""
+        if len(images) == 0:
+            return []
+        start = time.perf_counter()
+        predictions, org_imgs = self._batch_inference(images)
+        elapsed = time.perf_counter() - start
+        distances = [self._distance_from_boxes(self.get_boxes(prediction=prediction), org_img)
+                     for prediction, org_img in zip(predictions, org_imgs)]
+        for distance in distances:
+            # 批量推理按张均摊耗时
+            ONNX_INFERENCE.observe(elapsed / len(images))
+            SLIDER_DISTANCE.observe(distance)
+        return distances
+
 if __name__ == "__main__":
     onnx = ONNX()
     img_path="../assets/background.png"
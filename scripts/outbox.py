@@ -0,0 +1,181 @@
+"""
+Durable outbox for Home Assistant state pushes. Updates that fail because HA is unreachable
+(connection errors, 5xx while it restarts) are appended to a JSON-lines file under /data,
+and a background thread replays them with exponential backoff until HA accepts them. The
+scraped data of a run is therefore not lost and no browser rerun is needed to publish it.
+
+Only the newest queued body of each entity is replayed, and an entity that is later pushed
+successfully by a normal run is dropped from the outbox so stale values never overwrite
+newer ones.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import scheduler
+
+
+def default_outbox_path():
+    path = "ha_outbox.jsonl"
+    if 'PYTHON_IN_DOCKER' in os.environ:
+        path = "/data/" + path
+    return path
+
+
+def retryable(result):
+    """连接失败或 HA 返回 5xx 时值得稍后重试；4xx（如令牌错误）重试也不会成功。"""
+    return result.status is None or result.status >= 500
+
+
+class Outbox:
+
+    def __init__(self, client, path=None, cache=None, retry_base=30, retry_cap=1800):
+        """
+        :param client: 用于重放的 HAClient
+        :param cache: 可选的 PushCache，重放成功后同样记录
+        :param retry_base: 首次重试等待秒数，之后指数增长到 retry_cap
+        """
+        self.client = client
+        self.path = path or default_outbox_path()
+        self.cache = cache
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, client, cache=None):
+        """HA_OUTBOX 关闭时返回 None。"""
+        if os.getenv("HA_OUTBOX", "true").lower() != "true":
+            return None
+        return cls(client, cache=cache)
+
+    def _read(self):
+        if not os.path.isfile(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if not isinstance(entry, dict) or not {"entity_id", "body", "queued_at"} <= entry.keys():
+                        raise ValueError("缺少字段")
+                    entry["queued_at"] = float(entry["queued_at"])
+                except (ValueError, TypeError):
+                    # 写入中途断电留下的半行，或被手动改坏的记录
+                    logging.warning(f"待推送队列 {self.path} 中有损坏的记录，已忽略。")
+                    continue
+                entries.append(entry)
+        return entries
+
+    def _rewrite(self, entries):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append(self, states):
+        """把 [(entity_id, body)] 追加到队列并唤醒后台重放。"""
+        if not states:
+            return
+        now = time.time()
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for entity_id, body in states:
+                    f.write(json.dumps({"entity_id": entity_id, "body": body, "queued_at": now}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        logging.warning(f"{len(states)} 个实体推送失败，已写入待推送队列 {self.path}，HA 恢复后自动补推。")
+        self._wake.set()
+
+    def discard(self, entity_ids):
+        """这些实体刚推送成功，删除其排队中的旧值。"""
+        entity_ids = set(entity_ids)
+        if not entity_ids:
+            return
+        with self._lock:
+            entries = self._read()
+            remaining = [e for e in entries if e["entity_id"] not in entity_ids]
+            if len(remaining) != len(entries):
+                self._rewrite(remaining)
+
+    def pending(self):
+        with self._lock:
+            return len({e["entity_id"] for e in self._read()})
+
+    def drain(self):
+        """重放队列中每个实体的最新值，返回 (成功数, 仍待推送数)。"""
+        with self._lock:
+            latest = {}
+            for entry in self._read():
+                latest[entry["entity_id"]] = entry
+        if not latest:
+            return 0, 0
+        # 排队之后已有正常任务推送成功的实体，其排队值已过时，直接丢弃
+        stale = {}
+        if self.cache is not None:
+            for entity_id, entry in latest.items():
+                pushed_at = self.cache.pushed_at(entity_id)
+                if pushed_at is not None and pushed_at >= entry["queued_at"]:
+                    stale[entity_id] = entry["queued_at"]
+            if stale:
+                logging.info(f"待推送队列中 {len(stale)} 个实体已有更新的值推送成功，丢弃排队中的旧值。")
+        entries = [e for e in latest.values() if e["entity_id"] not in stale]
+        results = self.client.post_states([(e["entity_id"], e["body"]) for e in entries]) if entries else []
+        sent = {e["entity_id"]: e["queued_at"] for e, r in zip(entries, results) if r.ok}
+        dropped = {e["entity_id"]: e["queued_at"] for e, r in zip(entries, results) if not r.ok and not retryable(r)}
+        for entry, result in zip(entries, results):
+            if entry["entity_id"] in dropped:
+                logging.error(f"待推送实体 {entry['entity_id']} 被 HA 拒绝（{result.status}），不再重试: {result.error}")
+        done = {**sent, **dropped, **stale}
+        with self._lock:
+            # 重放期间新追加的记录保留，同一实体只留最新一条
+            latest = {}
+            for entry in self._read():
+                if entry["queued_at"] > done.get(entry["entity_id"], -1):
+                    latest[entry["entity_id"]] = entry
+            remaining = list(latest.values())
+            self._rewrite(remaining)
+        if self.cache is not None:
+            self.cache.mark([(e["entity_id"], e["body"]) for e in entries if e["entity_id"] in sent])
+        left = len(remaining)
+        if sent:
+            logging.info(f"待推送队列已补推 {len(sent)} 个实体，剩余 {left} 个。")
+        return len(sent), left
+
+    def start(self):
+        """启动后台重放线程，队列中有上次遗留的记录时立即尝试。"""
+        self._thread = threading.Thread(target=self._run, name="ha-outbox", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                sent, left = self.drain()
+            except Exception:
+                # 线程退出后队列再也不会补推，任何异常都只记录并按退避重试
+                logging.exception(f"重放待推送队列 {self.path} 失败。")
+                sent, left = 0, 1
+            if not left:
+                attempt = 0
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            attempt = 0 if sent else attempt + 1
+            delay = scheduler.backoff_delay(max(attempt, 1), self.retry_base, self.retry_cap)
+            logging.info(f"待推送队列仍有 {left} 个实体，{delay:.0f}s 后重试。")
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
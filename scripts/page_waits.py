@@ -0,0 +1,117 @@
+"""
+Wait on concrete page conditions (Element UI loading masks, pending XHR/fetch requests,
+target elements) instead of fixed sleeps. The old sleep duration is kept as the upper
+bound, so a step is never slower than before.
+
+The request hook can only be installed once a document exists, so requests the page started
+while loading are invisible to it. The page therefore only counts as idle once the document
+is complete, no loading mask is shown, no hooked request is pending and no request of any
+kind (hooked, or finished according to the Resource Timing API) has been active for
+quiet_ms; a request that started before the hook restarts the quiet period when it ends.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+# 首次调用时挂钩 XMLHttpRequest/fetch 统计未完成请求；挂钩前发出的请求结束后出现在
+# Resource Timing 中，同样计入最近活动时间；返回页面是否空闲所需的状态
+PAGE_STATE_JS = """
+if (window.__gwPendingRequests === undefined) {
+    window.__gwPendingRequests = 0;
+    window.__gwLastRequestActivity = Date.now();
+    const begin = () => { window.__gwPendingRequests++; window.__gwLastRequestActivity = Date.now(); };
+    const end = () => { window.__gwPendingRequests = Math.max(0, window.__gwPendingRequests - 1); window.__gwLastRequestActivity = Date.now(); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        begin();
+        this.addEventListener("loadend", end);
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            return fetch.apply(this, arguments).finally(end);
+        };
+    }
+}
+const masks = Array.from(document.querySelectorAll(".el-loading-mask")).filter(
+    e => e.getClientRects().length > 0 && getComputedStyle(e).display !== "none");
+let lastActivity = window.__gwLastRequestActivity;
+if (window.performance && performance.getEntriesByType) {
+    for (const entry of performance.getEntriesByType("resource")) {
+        lastActivity = Math.max(lastActivity, performance.timeOrigin + entry.responseEnd);
+    }
+}
+return [document.readyState === "complete", masks.length, window.__gwPendingRequests,
+        Date.now() - lastActivity];
+"""
+
+
+class PageWaiter:
+
+    def __init__(self, implicit_wait, enabled=True, quiet_ms=500, poll_frequency=0.2):
+        """
+        :param implicit_wait: 驱动的隐式等待时间，等待期间临时置 0，结束后恢复
+        :param enabled: False 时退回固定 sleep
+        :param quiet_ms: 最近一次请求结束后需保持安静的毫秒数
+        """
+        self.implicit_wait = implicit_wait
+        self.enabled = enabled
+        self.quiet_ms = quiet_ms
+        self.poll_frequency = poll_frequency
+        self._waited = defaultdict(float)
+        self._saved = defaultdict(float)
+        self._counts = defaultdict(int)
+        # 并发标签页共用同一个 PageWaiter
+        self._lock = threading.Lock()
+
+    def is_idle(self, driver):
+        ready, masks, pending, quiet_for = driver.execute_script(PAGE_STATE_JS)
+        return ready and masks == 0 and pending == 0 and quiet_for >= self.quiet_ms
+
+    def wait(self, driver, step, timeout, condition=None):
+        """等待页面空闲且 condition(driver) 为真，最多 timeout 秒（即原来的固定等待时间）。"""
+        start = time.perf_counter()
+        if not self.enabled:
+            time.sleep(timeout)
+            return
+        driver.implicitly_wait(0)
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency).until(
+                lambda d: self.is_idle(d) and (condition is None or condition(d))
+            )
+        except TimeoutException:
+            logging.debug(f"等待 [{step}] 达到上限 {timeout}s。")
+        except Exception as e:
+            # 页面跳转中脚本执行失败等情况，按剩余时间兜底
+            logging.debug(f"等待 [{step}] 出错，改为固定等待: {e}")
+            time.sleep(max(0, timeout - (time.perf_counter() - start)))
+        finally:
+            driver.implicitly_wait(self.implicit_wait)
+        elapsed = time.perf_counter() - start
+        saved = max(0.0, timeout - elapsed)
+        with self._lock:
+            self._waited[step] += elapsed
+            self._saved[step] += saved
+            self._counts[step] += 1
+        logging.debug(f"等待 [{step}] 用时 {elapsed:.2f}s，固定等待 {timeout}s，节省 {saved:.2f}s。")
+
+    def log_report(self):
+        """按步骤汇总本次任务的等待与节省时间，并清零。"""
+        with self._lock:
+            waited, saved, counts = dict(self._waited), dict(self._saved), dict(self._counts)
+            self._waited.clear()
+            self._saved.clear()
+            self._counts.clear()
+        if not counts:
+            return
+        for step in sorted(saved, key=saved.get, reverse=True):
+            logging.info(
+                f"等待统计 [{step}]: {counts[step]} 次，共等待 {waited[step]:.1f}s，节省 {saved[step]:.1f}s。")
+        logging.info(f"本次任务等待共节省 {sum(saved.values()):.1f}s。")
@@ -0,0 +1,102 @@
+"""
+Remember what was last pushed to each Home Assistant entity so unchanged sensors are not
+re-posted every run (each write adds recorder rows in HA). The cache is a small JSON file
+of entity_id -> body hash and push time; entries older than the forced refresh interval
+are pushed again regardless.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+def default_cache_path():
+    path = "ha_push_cache.json"
+    if 'PYTHON_IN_DOCKER' in os.environ:
+        path = "/data/" + path
+    return path
+
+
+class PushCache:
+
+    def __init__(self, path=None, refresh_hours=24, volatile_attributes=None):
+        """
+        :param refresh_hours: 超过该时间未推送的实体即使未变化也重新推送
+        :param volatile_attributes: {实体名前缀: (属性名, ...)}，这些属性每次都会变化，比较时忽略
+        """
+        self.path = path or default_cache_path()
+        self.refresh_seconds = refresh_hours * 3600
+        self.volatile_attributes = volatile_attributes or {}
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """HA_SKIP_UNCHANGED 关闭时返回 None。"""
+        if os.getenv("HA_SKIP_UNCHANGED", "true").lower() != "true":
+            return None
+        return cls(refresh_hours=float(os.getenv("HA_FORCE_REFRESH_HOURS", 24)), **kwargs)
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError as e:
+            logging.warning(f"推送缓存文件 {self.path} 格式错误，忽略: {e}")
+            return {}
+
+    def fingerprint(self, entity_id, body):
+        ignored = next((keys for prefix, keys in self.volatile_attributes.items() if entity_id.startswith(prefix)), ())
+        if ignored:
+            body = {**body, "attributes": {k: v for k, v in body.get("attributes", {}).items() if k not in ignored}}
+        return hashlib.sha1(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def split(self, states):
+        """把 [(entity_id, body)] 分为需要推送与可以跳过的两部分。"""
+        now = time.time()
+        changed, unchanged = [], []
+        with self._lock:
+            for entity_id, body in states:
+                entry = self._entries.get(entity_id)
+                if (entry is not None and entry["hash"] == self.fingerprint(entity_id, body)
+                        and now - entry["pushed_at"] < self.refresh_seconds):
+                    unchanged.append((entity_id, body))
+                else:
+                    changed.append((entity_id, body))
+        return changed, unchanged
+
+    def mark(self, states):
+        """记录推送成功的实体并写盘。"""
+        if not states:
+            return
+        now = time.time()
+        with self._lock:
+            for entity_id, body in states:
+                self._entries[entity_id] = {"hash": self.fingerprint(entity_id, body), "pushed_at": now}
+            self._save()
+
+    def pushed_at(self, entity_id):
+        """实体最近一次推送成功的时间戳，没有记录时返回 None。"""
+        with self._lock:
+            entry = self._entries.get(entity_id)
+            return entry["pushed_at"] if entry is not None else None
+
+    def forget(self, entity_ids):
+        with self._lock:
+            for entity_id in entity_ids:
+                self._entries.pop(entity_id, None)
+            self._save()
+
+    def _save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"写入推送缓存 {self.path} 失败: {e}")
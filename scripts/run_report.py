@@ -0,0 +1,114 @@
+"""
+Lightweight timing spans for one DataFetcher.fetch run. Phases are aggregated by name
+(count / total / max / failures), counters track retries, and the whole run is written
+as JSON to /data so slow steps can be found without reading the logs.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# 报告中保留的明细条数上限，汇总不受影响
+MAX_SPANS = 1000
+
+
+def default_report_path(account):
+    path = f"run_report_{account[-4:]}.json" if account else "run_report.json"
+    if 'PYTHON_IN_DOCKER' in os.environ:
+        path = "/data/" + path
+    return path
+
+
+class RunReport:
+
+    def __init__(self, account=""):
+        self.account = account
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._counters = defaultdict(int)
+        self._spans = []
+
+    @contextmanager
+    def span(self, name, **labels):
+        """记录 with 块的耗时；块内抛出异常时记为失败并继续抛出。"""
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, ok, start=start, **labels)
+
+    def record(self, name, duration, ok=True, start=None, **labels):
+        """记录一段已结束的耗时，用于无法套 with 的循环体。"""
+        with self._lock:
+            phase = self._phases.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "failed": 0})
+            phase["count"] += 1
+            phase["total"] += duration
+            phase["max"] = max(phase["max"], duration)
+            if not ok:
+                phase["failed"] += 1
+            if len(self._spans) < MAX_SPANS:
+                offset = (start if start is not None else time.perf_counter() - duration) - self._start
+                self._spans.append({"name": name, "start": round(offset, 3), "duration": round(duration, 3), "ok": ok, **labels})
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def to_dict(self, status):
+        with self._lock:
+            phases = {
+                name: {**phase, "total": round(phase["total"], 3), "max": round(phase["max"], 3),
+                       "avg": round(phase["total"] / phase["count"], 3)}
+                for name, phase in sorted(self._phases.items(), key=lambda item: item[1]["total"], reverse=True)
+            }
+            return {
+                "account": self.account,
+                "status": status,
+                "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "duration": round(time.perf_counter() - self._start, 3),
+                "phases": phases,
+                "counters": dict(self._counters),
+                "spans": list(self._spans),
+            }
+
+    def write(self, status, path=None):
+        """写入 JSON 报告并在日志中列出最耗时的几个阶段。"""
+        path = path or default_report_path(self.account)
+        report = self.to_dict(status)
+        try:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"写入运行报告 {path} 失败: {e}")
+            return report
+        top = "，".join(f"{name} {phase['total']:.1f}s" for name, phase in list(report["phases"].items())[:5])
+        logging.info(f"本次任务结束（{status}），用时 {report['duration']:.1f}s，主要耗时: {top}。报告已写入 {path}。")
+        return report
+
+
+def timed(name):
+    """方法装饰器：在 self.report 的同名阶段中计时，没有 report 时直接执行。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            report = getattr(self, "report", None)
+            if report is None:
+                return func(self, *args, **kwargs)
+            with report.span(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,106 @@
+"""
+Scheduler core around the `schedule` jobs: the main thread sleeps until the next job is due
+instead of polling every second, a shared event cancels both that sleep and retry backoffs,
+and a watchdog stops a fetch that overruns its time budget by closing its browser.
+
+`schedule` is not thread-safe, so jobs are only added or cancelled on the thread running
+run_forever; worker threads hand such changes over with call_soon.
+"""
+
+import logging
+import queue
+import random
+import threading
+
+import schedule
+
+# 进程退出时置位，打断调度等待与重试退避
+shutdown_event = threading.Event()
+# 其他线程新增任务后置位，让主线程重新计算休眠时间
+_wakeup_event = threading.Event()
+# 其他线程交给调度线程执行的 (函数, 参数)
+_pending_calls = queue.SimpleQueue()
+
+# 单次最长休眠，防止系统时间跳变后错过任务
+MAX_IDLE_SECONDS = 300
+
+
+def wake():
+    """新增或修改任务后调用，主线程立即重新计算下一个到期时间。"""
+    _wakeup_event.set()
+
+
+def call_soon(func, *args):
+    """在调度线程中执行 func(*args)，供工作线程修改任务表。"""
+    _pending_calls.put((func, args))
+    _wakeup_event.set()
+
+
+def run_pending_calls():
+    """执行其他线程通过 call_soon 提交的调用，单个调用出错不影响其余调用。"""
+    while True:
+        try:
+            func, args = _pending_calls.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            func(*args)
+        except Exception:
+            logging.exception(f"调度线程执行 {getattr(func, '__qualname__', func)} 失败。")
+
+
+def stop():
+    shutdown_event.set()
+    _wakeup_event.set()
+
+
+def run_forever(stop_event=shutdown_event, max_idle=MAX_IDLE_SECONDS):
+    """休眠到下一个任务到期再执行，stop_event 置位时返回。"""
+    while not stop_event.is_set():
+        _wakeup_event.clear()
+        run_pending_calls()
+        idle = schedule.idle_seconds()
+        if idle is None or idle > 0:
+            if idle is not None:
+                logging.debug(f"距下一个任务 {idle:.0f}s，进入休眠。")
+            _wakeup_event.wait(max_idle if idle is None else min(idle, max_idle))
+            continue
+        schedule.run_pending()
+
+
+def backoff_delay(attempt, base, cap):
+    """第 attempt 次失败后的等待秒数：指数增长，上限 cap，后一半随机抖动。"""
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RunWatchdog:
+    """
+    超过 timeout 秒仍未结束时调用 fetcher.abort()，关闭其浏览器使抓取尽快失败退出。
+
+    with RunWatchdog(fetcher, 1800):
+        fetcher.fetch()
+    """
+
+    def __init__(self, fetcher, timeout):
+        self.fetcher = fetcher
+        self.timeout = timeout
+        self.fired = False
+        self._timer = None
+
+    def _fire(self):
+        self.fired = True
+        logging.error(f"账号 {self.fetcher._username} 任务超过 {self.timeout:.0f}s 未结束，强制终止并回收浏览器。")
+        self.fetcher.abort()
+
+    def __enter__(self):
+        if self.timeout and self.timeout > 0:
+            self._timer = threading.Timer(self.timeout, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._timer is not None:
+            self._timer.cancel()
+        return False
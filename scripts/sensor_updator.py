@@ -1,21 +1,34 @@
 import logging
 import os
+import threading
 from datetime import datetime,timedelta
 
 import requests
 from sympy import true
 
 from const import *
+from ha_client import PushResult, create_client
+from outbox import retryable
+
+
+# 余额实体的 last_reset 是推送时刻，比较是否变化时忽略
+VOLATILE_ATTRIBUTES = {BALANCE_SENSOR_NAME: ("last_reset",)}
 
 
 class SensorUpdator:
 
-    def __init__(self):
-        HASS_URL = os.getenv("HASS_URL")
-        HASS_TOKEN = os.getenv("HASS_TOKEN")
-        self.base_url = HASS_URL[:-1] if HASS_URL.endswith("/") else HASS_URL
-        self.token = HASS_TOKEN
+    def __init__(self, client=None, cache=None, outbox=None):
+        """
+        :param client: 多账号共用的 HAClient，为空时按 HA_TRANSPORT 新建
+        :param cache: 多账号共用的 PushCache，为空时不跳过未变化的实体
+        :param outbox: 多账号共用的 Outbox，HA 不可达时失败的实体写入其中稍后补推
+        """
+        self.client = client if client is not None else create_client()
+        self.cache = cache
+        self.outbox = outbox
         self.RECHARGE_NOTIFY = os.getenv("RECHARGE_NOTIFY", "false").lower() == "true"
+        # update_one_userid 期间各 update_* 的请求先收集到当前线程的批次中，最后并发推送
+        self._local = threading.local()
 
     def update_one_userid(
         self,
@@ -31,7 +44,57 @@ class SensorUpdator:
         month_tou=None,
         first_day_history=None,
     ):
+        """推送一个户号的全部实体，返回 PushResult 列表。"""
         postfix = f"_{user_id[-4:]}"
+        self._local.batch = []
+        try:
+            self._collect_userid(
+                user_id, postfix, balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage,
+                month_charge, month_usage, yesterday_tou, month_tou, first_day_history)
+            states = self._local.batch
+        finally:
+            self._local.batch = None
+
+        states, unchanged = self._split_unchanged(states)
+        results = self.client.post_states(states)
+        for (sensorName, request_body), result in zip(states, results):
+            if result.ok:
+                unit = request_body["attributes"].get("unit_of_measurement", "")
+                logging.info(f"HA 传感器 {sensorName} 已更新: {request_body['state']} {unit}")
+            else:
+                logging.error(f"HA 传感器 {sensorName} 更新失败，状态码 {result.status}，原因: {result.error}")
+        if self.cache is not None:
+            self.cache.mark([state for state, result in zip(states, results) if result.ok])
+        if self.outbox is not None:
+            self.outbox.discard(result.entity_id for result in results if result.ok)
+            self.outbox.append([state for state, result in zip(states, results) if not result.ok and retryable(result)])
+        failed = sum(1 for result in results if not result.ok)
+        summary = f"推送 {len(results) - failed} 个，未变化跳过 {len(unchanged)} 个"
+        if failed:
+            logging.warning(f"户号 {user_id} 状态刷新完成，{summary}，{failed} 个实体推送失败。")
+        else:
+            logging.info(f"户号 {user_id} 状态刷新完成，{summary}。")
+        return results + [PushResult(entity_id, True, skipped=True) for entity_id, _ in unchanged]
+
+    def _split_unchanged(self, states):
+        """
+        去掉与上次推送内容相同的实体。通过 REST 写入的状态在 HA 重启后不会保留，
+        因此跳过前先确认其中一个实体仍然存在，不存在则全部重新推送。
+        """
+        if self.cache is None:
+            return states, []
+        changed, unchanged = self.cache.split(states)
+        if not unchanged:
+            return changed, []
+        status = self.client.get_state_status(unchanged[0][0])
+        if status != 200:
+            logging.info(f"HA 中实体 {unchanged[0][0]} 不可用（{status}），本次全部重新推送。")
+            self.cache.forget(entity_id for entity_id, _ in unchanged)
+            return states, []
+        return changed, unchanged
+
+    def _collect_userid(self, user_id, postfix, balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage,
+                        month_charge, month_usage, yesterday_tou, month_tou, first_day_history):
         if balance is not None:
             self.balance_notify(user_id, balance)
             self.update_balance(postfix, balance)
@@ -58,8 +121,6 @@ class SensorUpdator:
         if first_day_history:
             self.update_first_day_history(postfix, first_day_history)
 
-        logging.info(f"户号 {user_id} 状态刷新完成。")
-
     def update_yesterday_tou(self, postfix: str, tou: dict):
         mapping = [
             (YESTERDAY_VALLEY_SENSOR_NAME, tou.get("valley"), "谷用电"),
@@ -84,7 +145,6 @@ class SensorUpdator:
                 },
             }
             self.send_url(sensorName, request_body)
-            logging.info(f"HA 传感器 {sensorName} 已更新: {value} kWh")
 
     def update_month_tou(self, postfix: str, tou: dict):
         mapping = [
@@ -117,7 +177,6 @@ class SensorUpdator:
                 },
             }
             self.send_url(sensorName, request_body)
-            logging.info(f"HA 传感器 {sensorName} 已更新: {value} {unit}")
 
     def update_first_day_history(self, postfix: str, first_day: dict):
         sensorName = FIRST_DAY_HISTORY_SENSOR_NAME + postfix
@@ -133,7 +192,6 @@ class SensorUpdator:
             },
         }
         self.send_url(sensorName, request_body)
-        logging.info(f"HA 传感器 {sensorName} 已更新: {state_text}")
 
     def update_last_daily_usage(self, postfix: str, last_daily_date: str, sensorState: float):
         sensorName = DAILY_USAGE_SENSOR_NAME + postfix
@@ -150,7 +208,6 @@ class SensorUpdator:
         }
 
         self.send_url(sensorName, request_body)
-        logging.info(f"HA 传感器 {sensorName} 已更新: {sensorState} kWh")
 
     def update_balance(self, postfix: str, sensorState: float):
         sensorName = BALANCE_SENSOR_NAME + postfix
@@ -168,7 +225,6 @@ class SensorUpdator:
         }
 
         self.send_url(sensorName, request_body)
-        logging.info(f"HA 传感器 {sensorName} 已更新: {sensorState} 元")
 
     def update_month_data(self, postfix: str, sensorState: float, usage=False):
         sensorName = (
@@ -193,7 +249,6 @@ class SensorUpdator:
         }
 
         self.send_url(sensorName, request_body)
-        logging.info(f"HA 传感器 {sensorName} 已更新: {sensorState} {'kWh' if usage else '元'}")
 
     def update_yearly_data(self, postfix: str, sensorState: float, usage=False):
         sensorName = (
@@ -218,21 +273,17 @@ class SensorUpdator:
             },
         }
         self.send_url(sensorName, request_body)
-        logging.info(f"HA 传感器 {sensorName} 已更新: {sensorState} {'kWh' if usage else '元'}")
 
     def send_url(self, sensorName, request_body):
-        headers = {
-            "Content-Type": "application-json",
-            "Authorization": "Bearer " + self.token,
-        }
-        url = self.base_url + API_PATH + sensorName  # /api/states/<entity_id>
-        try:
-            response = requests.post(url, json=request_body, headers=headers)
-            logging.debug(
-                f"调用 HA REST API POST {url}，返回 {response.status_code}: {response.content}"
-            )
-        except Exception as e:
-            logging.error(f"调用 HA REST API 失败，原因: {e}")
+        """在 update_one_userid 中只加入批次；单独调用时立即推送并返回 PushResult。"""
+        batch = getattr(self._local, "batch", None)
+        if batch is not None:
+            batch.append((sensorName, request_body))
+            return None
+        result = self.client.post_state(sensorName, request_body)
+        if not result.ok:
+            logging.error(f"调用 HA REST API 失败，状态码 {result.status}，原因: {result.error}")
+        return result
 
     def balance_notify(self, user_id, balance):
 
@@ -245,7 +296,7 @@ class SensorUpdator:
                     title = "电费余额不足提醒"
                     content = (f"您用户号{user_id}的当前电费余额为：{balance}元，请及时充值。" )
                     url = ("http://www.pushplus.plus/send?token="+ token+ "&title="+ title+ "&content="+ content)
-                    requests.get(url)
+                    requests.get(url, timeout=self.client.timeout)
                     logging.info(
                         f"户号 {user_id} 当前余额 {balance} 元，低于阈值 {BALANCE} 元，已发送提醒，请及时充值。"
                     )
@@ -0,0 +1,82 @@
+"""
+Persist the cookies and localStorage of a logged-in 95598 session to an encrypted file,
+so later runs can skip the login form and slider captcha.
+"""
+
+import base64
+import json
+import logging
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+KDF_ITERATIONS = 200_000
+
+
+class SessionStore:
+
+    def __init__(self, username: str, password: str, path: str = None):
+        if path is None:
+            path = f"session_{username}.enc"
+            if 'PYTHON_IN_DOCKER' in os.environ:
+                path = "/data/" + path
+        self.path = path
+        # 密钥由账号密码派生，文件离开本机配置即无法解密
+        self._secret = f"{username}:{password}".encode("utf-8")
+
+    def _fernet(self, salt: bytes):
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+        return Fernet(base64.urlsafe_b64encode(kdf.derive(self._secret)))
+
+    def save(self, driver):
+        """保存当前浏览器的 cookies 与 localStorage。"""
+        try:
+            state = {
+                "cookies": driver.get_cookies(),
+                "local_storage": driver.execute_script(
+                    "return Object.assign({}, window.localStorage);"),
+            }
+            salt = os.urandom(16)
+            token = self._fernet(salt).encrypt(json.dumps(state).encode("utf-8"))
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"salt": base64.b64encode(salt).decode(), "token": token.decode()}, f)
+            os.replace(tmp_path, self.path)
+            logging.info(f"登录状态已加密保存到 {self.path}。")
+        except Exception as e:
+            logging.warning(f"保存登录状态失败: {e}")
+
+    def load(self):
+        """读取并解密保存的登录状态，不存在或无法解密时返回 None。"""
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            salt = base64.b64decode(data["salt"])
+            return json.loads(self._fernet(salt).decrypt(data["token"].encode()))
+        except (InvalidToken, KeyError, ValueError) as e:
+            logging.warning(f"登录状态文件 {self.path} 无法解密，忽略: {e}")
+            return None
+
+    def apply(self, driver, state):
+        """把登录状态写回浏览器，调用前需先打开同域名页面。"""
+        for cookie in state.get("cookies", []):
+            cookie = {k: v for k, v in cookie.items() if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")}
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                logging.debug(f"恢复 cookie {cookie.get('name')} 失败: {e}")
+        driver.execute_script(
+            "const items = arguments[0];"
+            "for (const key in items) { window.localStorage.setItem(key, items[key]); }",
+            state.get("local_storage") or {},
+        )
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,147 @@
+"""
+Debug screenshots without slowing the scraper down: the scraping thread only grabs the PNG
+bytes from the browser, a background thread decodes, optionally downscales or converts to
+WebP, writes the file and keeps all run_* directories under a disk budget.
+"""
+
+import io
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+
+from PIL import Image
+
+LEVELS = ("off", "errors", "full")
+
+
+class SnapshotWriter:
+
+    def __init__(self, base_dir, level="full", image_format="png", scale=1.0, max_mb=200, queue_size=8):
+        """
+        :param base_dir: 截图根目录，每次任务在其下创建 run_* 子目录
+        :param level: off 不截图；errors 只保存出错时的截图；full 保存全部截图
+        :param image_format: png 或 webp
+        :param scale: 缩放比例，1 为原尺寸
+        :param max_mb: 所有 run_* 目录的总大小上限（MB），超出时从最旧的截图开始删除，0 表示不限制
+        :param queue_size: 待写入队列长度，队列满时丢弃新截图而不阻塞抓取
+        """
+        self.base_dir = base_dir
+        self.level = level if level in LEVELS else "full"
+        self.image_format = image_format if image_format in ("png", "webp") else "png"
+        self.scale = min(max(scale, 0.1), 1.0)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.run_dir = None
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, base_dir):
+        return cls(
+            base_dir,
+            level=os.getenv("SNAPSHOT_LEVEL", "full").lower(),
+            image_format=os.getenv("SNAPSHOT_FORMAT", "png").lower(),
+            scale=float(os.getenv("SNAPSHOT_SCALE", 1.0)),
+            max_mb=float(os.getenv("SNAPSHOT_MAX_MB", 200)),
+        )
+
+    def start_run(self, suffix=""):
+        """为本次任务指定新的 run_* 目录，目录在第一次写入时才创建。"""
+        name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.run_dir = os.path.join(self.base_dir, f"{name}_{suffix}" if suffix else name)
+
+    def capture(self, driver, prefix, error=False):
+        """在当前线程取得截图数据，编码与写盘交给后台线程。"""
+        if self.level == "off" or (self.level == "errors" and not error):
+            return
+        try:
+            png = driver.get_screenshot_as_png()
+        except Exception as e:
+            logging.debug(f"保存页面截图失败: {e}")
+            return
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.run_dir or self.base_dir, f"{prefix}_{ts}.{self.image_format}")
+        try:
+            self._queue.put_nowait((path, png))
+        except queue.Full:
+            logging.debug(f"截图队列已满，丢弃截图 {prefix}。")
+            return
+        self._ensure_thread()
+
+    def flush(self):
+        """等待队列中的截图全部写完。"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="snapshot-writer", daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            path, png = self._queue.get()
+            try:
+                self._write(path, png)
+                self.enforce_budget()
+            except Exception as e:
+                logging.debug(f"写入截图 {path} 失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, png):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.image_format == "png" and self.scale == 1.0:
+            data = png
+        else:
+            image = Image.open(io.BytesIO(png))
+            if self.scale != 1.0:
+                size = (max(1, int(image.width * self.scale)), max(1, int(image.height * self.scale)))
+                image = image.resize(size, Image.BILINEAR)
+            buffer = io.BytesIO()
+            if self.image_format == "webp":
+                image.save(buffer, format="WEBP", quality=80, method=4)
+            else:
+                image.save(buffer, format="PNG", optimize=False)
+            data = buffer.getvalue()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        logging.info(f"已保存页面截图: {path}")
+
+    def enforce_budget(self):
+        """所有 run_* 目录超过磁盘预算时，从最旧的截图开始删除，并清理空目录。"""
+        if self.max_bytes <= 0 or not os.path.isdir(self.base_dir):
+            return
+        files = []
+        run_dirs = []
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir() or not entry.name.startswith("run_"):
+                continue
+            run_dirs.append(entry.path)
+            for item in os.scandir(entry.path):
+                if item.is_file():
+                    stat = item.stat()
+                    files.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                continue
+        for run_dir in run_dirs:
+            if run_dir != self.run_dir and os.path.isdir(run_dir) and not os.listdir(run_dir):
+                shutil.rmtree(run_dir, ignore_errors=True)
+        logging.info(f"截图目录超过 {self.max_bytes // (1024 * 1024)} MB，已删除最旧的 {removed} 张截图。")
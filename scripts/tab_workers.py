@@ -0,0 +1,183 @@
+"""
+Run several scraping workers concurrently in separate tabs of one logged-in WebDriver session.
+
+A WebDriver session executes one command at a time against its current window, so each
+worker gets a copy of the driver whose commands switch to the worker's own window first,
+under a shared lock. Implicit waits, async scripts and page loads are emulated per worker by
+polling, so the lock is never held while a worker waits for an element, for an async script
+to call back or for its page to load, and the tabs' page loads overlap.
+"""
+
+import copy
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from selenium.common.exceptions import JavascriptException, NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+FIND_COMMANDS = (Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT)
+FIND_ALL_COMMANDS = (Command.FIND_ELEMENTS, Command.FIND_CHILD_ELEMENTS)
+FIND_POLL_INTERVAL = 0.2
+# 会话默认的异步脚本与页面加载超时（秒）
+DEFAULT_SCRIPT_TIMEOUT = 30
+DEFAULT_PAGE_LOAD_TIMEOUT = 300
+
+# 以同步脚本启动异步脚本，回调结果存入页面全局变量，之后轮询取回
+ASYNC_START_JS = """
+const key = arguments[0];
+window[key] = {done: false};
+const done = value => { window[key] = {done: true, value}; };
+(function () { %s }).apply(null, Array.prototype.slice.call(arguments, 1).concat([done]));
+"""
+ASYNC_POLL_JS = """
+const result = window[arguments[0]];
+if (result && result.done) delete window[arguments[0]];
+return result === undefined ? null : result;
+"""
+# 在旧页面留下标记后开始导航（url 为 null 时刷新），标记消失且新页面加载完成即导航结束
+NAVIGATE_START_JS = """
+window[arguments[0]] = true;
+if (arguments[1] === null) window.location.reload(); else window.location.href = arguments[1];
+"""
+NAVIGATE_READY_JS = """
+return !window[arguments[0]] && document.readyState === "complete";
+"""
+
+
+class _SessionState:
+
+    def __init__(self, current_handle):
+        self.lock = threading.Lock()
+        self.current_handle = current_handle
+
+
+def bind_to_window(driver, handle, state, implicit_wait):
+    """返回只在 handle 窗口内执行命令的 driver 副本，该副本上查找到的元素同样绑定此窗口。"""
+    bound = copy.copy(driver)
+    real_execute = type(driver).execute
+    timeouts = {"implicit": implicit_wait, "script": DEFAULT_SCRIPT_TIMEOUT, "pageLoad": DEFAULT_PAGE_LOAD_TIMEOUT}
+
+    def locked_execute(driver_command, params=None):
+        with state.lock:
+            if state.current_handle != handle:
+                real_execute(bound, Command.SWITCH_TO_WINDOW, {"handle": handle})
+                state.current_handle = handle
+            return real_execute(bound, driver_command, params)
+
+    def execute(driver_command, params=None):
+        if driver_command == Command.SET_TIMEOUTS and params and set(params) == {"implicit"}:
+            # 隐式等待是会话级设置，改为在本 worker 内模拟
+            timeouts["implicit"] = params["implicit"] / 1000
+            return {"value": None}
+        if driver_command == Command.SET_TIMEOUTS and params:
+            for name in ("script", "pageLoad"):
+                if name in params:
+                    timeouts[name] = params[name] / 1000
+        if driver_command == Command.GET:
+            return navigate(params["url"])
+        if driver_command == Command.REFRESH:
+            return navigate(None)
+        if driver_command == Command.W3C_EXECUTE_SCRIPT_ASYNC:
+            return execute_async(params["script"], params.get("args", []))
+        if driver_command not in FIND_COMMANDS + FIND_ALL_COMMANDS:
+            return locked_execute(driver_command, params)
+        deadline = time.monotonic() + timeouts["implicit"]
+        while True:
+            try:
+                response = locked_execute(driver_command, dict(params or {}))
+            except NoSuchElementException:
+                if time.monotonic() >= deadline:
+                    raise
+            else:
+                if driver_command in FIND_COMMANDS or response.get("value") or time.monotonic() >= deadline:
+                    return response
+            time.sleep(FIND_POLL_INTERVAL)
+
+    def execute_async(script, args):
+        # 异步脚本等待回调期间不占用会话锁，其他标签页照常执行
+        key = f"__tab_async_{uuid.uuid4().hex}"
+        locked_execute(Command.W3C_EXECUTE_SCRIPT, {"script": ASYNC_START_JS % script, "args": [key, *args]})
+        deadline = time.monotonic() + timeouts["script"]
+        while True:
+            result = locked_execute(Command.W3C_EXECUTE_SCRIPT, {"script": ASYNC_POLL_JS, "args": [key]})["value"]
+            if result is None:
+                raise JavascriptException("异步脚本等待回调期间页面已刷新或跳转。")
+            if result.get("done"):
+                return {"value": result.get("value")}
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"异步脚本超过 {timeouts['script']:.0f}s 未回调。")
+            time.sleep(FIND_POLL_INTERVAL)
+
+    def navigate(url):
+        # driver.get 会阻塞到页面加载完成，改为脚本发起导航后在锁外轮询
+        key = f"__tab_navigating_{uuid.uuid4().hex}"
+        locked_execute(Command.W3C_EXECUTE_SCRIPT, {"script": NAVIGATE_START_JS, "args": [key, url]})
+        deadline = time.monotonic() + timeouts["pageLoad"]
+        while True:
+            time.sleep(FIND_POLL_INTERVAL)
+            try:
+                if locked_execute(Command.W3C_EXECUTE_SCRIPT, {"script": NAVIGATE_READY_JS, "args": [key]})["value"]:
+                    return {"value": None}
+            except WebDriverException as e:
+                # 导航切换文档的瞬间脚本可能执行失败，继续等待
+                logging.debug(f"标签页 {handle} 等待页面加载: {e}")
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"页面 {url or '刷新'} 超过 {timeouts['pageLoad']:.0f}s 未加载完成。")
+
+    bound.execute = execute
+    bound._switch_to = SwitchTo(bound)
+    return bound
+
+
+def run_in_tabs(driver, items, worker, concurrency, implicit_wait):
+    """
+    用 concurrency 个标签页并发处理 items，每项调用 worker(tab_driver, item)。
+
+    第一个 worker 使用当前窗口，其余各自新开标签页；结束后关闭新开的标签页并切回原窗口。
+    worker 自行处理单项的异常，未捕获的异常只记录日志，不影响其他项。
+    """
+    original_handle = driver.current_window_handle
+    handles = [original_handle]
+    for _ in range(max(1, min(concurrency, len(items))) - 1):
+        driver.switch_to.new_window("tab")
+        handles.append(driver.current_window_handle)
+    driver.switch_to.window(original_handle)
+    # 会话级隐式等待置 0，由各 worker 自行轮询
+    driver.implicitly_wait(0)
+
+    state = _SessionState(original_handle)
+    pending = queue.Queue()
+    for item in items:
+        pending.put(item)
+
+    def run(handle):
+        tab_driver = bind_to_window(driver, handle, state, implicit_wait)
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker(tab_driver, item)
+            except Exception as e:
+                logging.error(f"标签页 {handle} 处理 {item} 出错: {e}")
+
+    logging.info(f"使用 {len(handles)} 个标签页并发处理 {len(items)} 项。")
+    threads = [threading.Thread(target=run, args=(handle,), name=f"tab-{i}") for i, handle in enumerate(handles)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for handle in handles[1:]:
+        try:
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception as e:
+            logging.debug(f"关闭标签页 {handle} 失败: {e}")
+    driver.switch_to.window(original_handle)
+    driver.implicitly_wait(implicit_wait)